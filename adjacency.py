@@ -0,0 +1,245 @@
+# adjacency.py
+from array import array
+from bisect import bisect_right
+from collections.abc import Set
+
+import numpy as np
+
+
+class Adjacency:
+    """
+    Packed undirected adjacency for the graph.
+
+    Neighbors are kept per vertex in compact integer arrays indexed by vertex
+    id (ids are dense, handed out by `Graph.next_vertex_id`), so neighbor and
+    degree queries are O(1).  Every edge is also appended to a pair of flat
+    arrays (larger endpoint, smaller endpoint) for fast whole-graph passes,
+    and the structure can be exported in CSR form.
+
+    A new vertex is connected only to older (smaller) ids, so the flat
+    arrays stay sorted by larger endpoint: the edges of the graph as it was
+    when vertex m was added are a prefix of them (see `edge_prefix`).
+
+    After `load_edges` only the flat arrays exist; the neighbor arrays are
+    built on the first query that needs them, so whole-graph passes (and
+    drawing) can start right after a load.
+    """
+    def __init__(self):
+        self._neighbors = []
+        self._edge_hi = array('i')
+        self._edge_lo = array('i')
+        self._csr = None
+        self.edge_view = EdgeView(self)
+
+    def clear(self):
+        self._neighbors = []
+        self._edge_hi = array('i')
+        self._edge_lo = array('i')
+        self._csr = None
+
+    def __len__(self):
+        return len(self._edge_hi)
+
+    def _rows(self):
+        """The per-vertex neighbor arrays, built now if a load deferred them."""
+        if self._neighbors is None:
+            self._neighbors = self._build_rows()
+        return self._neighbors
+
+    def _row(self, v_id):
+        """Neighbor array of a vertex, growing the table on first use."""
+        neighbors = self._rows()
+        if v_id >= len(neighbors):
+            neighbors.extend([None] * (v_id + 1 - len(neighbors)))
+        row = neighbors[v_id]
+        if row is None:
+            row = neighbors[v_id] = array('i')
+        return row
+
+    def load_edges(self, edge_hi, edge_lo):
+        """
+        Replace every edge from flat (larger endpoint, smaller endpoint)
+        integer buffers.  The neighbor arrays are only built when first
+        needed (see `_build_rows`).
+        """
+        self.clear()
+        self._edge_hi.frombytes(memoryview(edge_hi).cast('B'))
+        self._edge_lo.frombytes(memoryview(edge_lo).cast('B'))
+        if len(self._edge_hi) != len(self._edge_lo):
+            raise ValueError("Edge buffers must have the same length")
+        if self._edge_hi:
+            self._neighbors = None
+            hi = np.frombuffer(self._edge_hi, dtype=np.intc)
+            if (hi[1:] < hi[:-1]).any():
+                # Restore the order by larger endpoint that edge_prefix relies on
+                order = np.argsort(hi, kind='stable')
+                lo = np.frombuffer(self._edge_lo, dtype=np.intc)
+                self._edge_hi = array('i', hi[order].tobytes())
+                self._edge_lo = array('i', lo[order].tobytes())
+
+    def _build_rows(self):
+        """
+        Neighbor arrays from the flat edge arrays, listing each vertex's
+        neighbors in edge order as if the edges had been added one by one.
+        """
+        hi = np.frombuffer(self._edge_hi, dtype=np.intc)
+        lo = np.frombuffer(self._edge_lo, dtype=np.intc)
+        # Each edge contributes one entry to both endpoints' rows, in order
+        owners = np.column_stack((hi, lo)).ravel()
+        targets = np.column_stack((lo, hi)).ravel()
+        order = np.argsort(owners, kind='stable')
+        owners, targets = owners[order], targets[order]
+        bounds = np.searchsorted(owners, np.arange(int(hi.max()) + 2))
+        data = targets.astype(np.intc).tobytes()
+        size = targets.itemsize
+        neighbors = [None] * (len(bounds) - 1)
+        for v_id, (start, stop) in enumerate(zip(bounds[:-1].tolist(), bounds[1:].tolist())):
+            if stop > start:
+                row = neighbors[v_id] = array('i')
+                row.frombytes(data[start * size:stop * size])
+        return neighbors
+
+    def neighbors(self, v_id):
+        """Neighbor ids of a vertex (treat the returned array as read-only)."""
+        neighbors = self._rows()
+        if v_id < len(neighbors) and neighbors[v_id] is not None:
+            return neighbors[v_id]
+        return array('i')
+
+    def degree(self, v_id):
+        neighbors = self._rows()
+        if v_id < len(neighbors) and neighbors[v_id] is not None:
+            return len(neighbors[v_id])
+        return 0
+
+    def degrees(self):
+        """Yield (vertex id, degree) for every vertex with at least one edge."""
+        for v_id, row in enumerate(self._rows()):
+            if row:
+                yield v_id, len(row)
+
+    def has_edge(self, u, v):
+        # Scan the shorter of the two neighbor arrays
+        if self.degree(u) > self.degree(v):
+            u, v = v, u
+        return v in self.neighbors(u)
+
+    def add_edge(self, u, v):
+        """Add an undirected edge; returns False if it already exists."""
+        if u == v or self.has_edge(u, v):
+            return False
+        self._append_edge(u, v)
+        return True
+
+    def connect_new_vertex(self, new_id, targets):
+        """
+        Connect a freshly created vertex to each of `targets`.  The vertex has
+        no edges yet and, ids being handed out in increasing order, is larger
+        than every target, so the edges are appended in one batch without
+        duplicate checks.
+        """
+        neighbors = self._rows()
+        if new_id >= len(neighbors):
+            neighbors.extend([None] * (new_id + 1 - len(neighbors)))
+        neighbors[new_id] = array('i', targets)
+        for v_id in targets:
+            row = neighbors[v_id]
+            if row is None:
+                row = neighbors[v_id] = array('i')
+            row.append(new_id)
+        self._edge_hi.extend([new_id] * len(targets))
+        self._edge_lo.extend(targets)
+        self._csr = None
+
+    def remove_last_vertex(self, v_id):
+        """
+        Undo `connect_new_vertex` for the most recently connected vertex,
+        whose edges must be the last ones added.  Returns its neighbors in
+        the order they were connected.
+        """
+        neighbors = self._rows()
+        targets = list(neighbors[v_id] or ())
+        count = len(targets)
+        if count == 0 or any(hi != v_id for hi in self._edge_hi[-count:]):
+            raise ValueError(f"Vertex {v_id} was not the last one connected")
+        for t_id in targets:
+            neighbors[t_id].pop()
+        del self._edge_hi[-count:]
+        del self._edge_lo[-count:]
+        del neighbors[v_id:]
+        self._csr = None
+        return targets
+
+    def _append_edge(self, u, v):
+        self._row(u).append(v)
+        self._row(v).append(u)
+        if u < v:
+            u, v = v, u
+        self._edge_hi.append(u)
+        self._edge_lo.append(v)
+        self._csr = None
+
+    def edges(self):
+        """Yield every edge once as a sorted (smaller id, larger id) tuple."""
+        for hi, lo in zip(self._edge_hi, self._edge_lo):
+            yield lo, hi
+
+    def edge_arrays(self):
+        """Flat (larger endpoint, smaller endpoint) arrays, one entry per edge."""
+        return self._edge_hi, self._edge_lo
+
+    def prefix_length(self, m):
+        """Number of edges between vertices 1..m, found by binary search."""
+        return bisect_right(self._edge_hi, m)
+
+    def edge_prefix(self, m):
+        """
+        (larger endpoint, smaller endpoint) NumPy views of the edges between
+        vertices 1..m: the graph as of vertex m, without copying or filtering.
+        """
+        cut = self.prefix_length(m)
+        return (np.frombuffer(self._edge_hi, dtype=np.intc, count=cut),
+                np.frombuffer(self._edge_lo, dtype=np.intc, count=cut))
+
+    def to_csr(self):
+        """
+        Export the adjacency as CSR integer arrays (indptr, indices).  Row v
+        holds the neighbors of vertex id v in indices[indptr[v]:indptr[v + 1]].
+        The result is cached until the next edge is added.
+        """
+        if self._csr is None:
+            indptr = array('q', [0])
+            indices = array('i')
+            for row in self._rows():
+                if row:
+                    indices.extend(row)
+                indptr.append(len(indices))
+            self._csr = (indptr, indices)
+        return self._csr
+
+
+class EdgeView(Set):
+    """Read-only set-like view of the edges as sorted (u, v) tuples."""
+    def __init__(self, adjacency):
+        self._adjacency = adjacency
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # Set operators (|, &, -) produce plain sets
+        return set(iterable)
+
+    def __len__(self):
+        return len(self._adjacency)
+
+    def __iter__(self):
+        return self._adjacency.edges()
+
+    def __contains__(self, edge):
+        try:
+            u, v = edge
+        except (TypeError, ValueError):
+            return False
+        return self._adjacency.has_edge(u, v)
+
+    def __repr__(self):
+        return f"EdgeView({len(self)} edges)"
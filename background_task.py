@@ -0,0 +1,62 @@
+# background_task.py
+import threading
+
+
+class TaskCancelled(Exception):
+    """Raised inside a background task once it has been asked to stop."""
+
+
+class BackgroundTask:
+    """
+    Runs one long graph operation on a worker thread.
+
+    `function(progress)` must only touch data private to the task (a copy of
+    the graph) and call `progress(done, total)` now and then: that records
+    how far it got and is where a cancelled task stops, by raising
+    TaskCancelled.  The event loop polls `finished` and then picks up
+    `result` (or `error`) itself, so the finished work is swapped in
+    between two frames and never seen half done.
+    """
+    def __init__(self, label, function):
+        self.label = label
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(function,), daemon=True)
+        self._thread.start()
+
+    def _run(self, function):
+        try:
+            self.result = function(self.progress)
+        except TaskCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+
+    def progress(self, done, total):
+        if self._cancel.is_set():
+            raise TaskCancelled()
+        self.done, self.total = done, total
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return not self._thread.is_alive()
+
+    def fraction(self):
+        return min(1.0, self.done / self.total) if self.total else 0.0
+
+    def status_text(self):
+        if self.cancelled:
+            return f"{self.label}: cancelling..."
+        if not self.total:
+            return f"{self.label}..."
+        return f"{self.label}: {self.done}/{self.total} ({self.fraction():.0%})"
@@ -0,0 +1,221 @@
+# benchmark.py - Headless benchmark suite for Graph construction, layout and statistics
+#
+# Usage:
+#   python benchmark.py                          # 1k / 10k / 100k, results in benchmark_results.json
+#   python benchmark.py --sizes 1000 5000 -o out.json
+#   python benchmark.py --compare old.json       # flag regressions against an earlier run
+#
+# Only graph.py (and NumPy) is imported, never pygame, so this runs on machines
+# without a display.
+import argparse
+import datetime
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import layout
+from graph import Graph
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_OUTPUT = "benchmark_results.json"
+
+# Largest graph each redraw mode is benchmarked on by default; the exact force
+# layout is O(V^2) per iteration and would take hours at 100k. Barnes-Hut is
+# O(V log V) per iteration but still takes 40-55 s at 100k (about 1 s for each
+# of its 50 iterations). Use --full to lift the limits.
+REDRAW_LIMITS = {
+    "force": 10000,
+    "barnes_hut": 100000,
+    "tutte": 100000,
+}
+
+# O(1) queries are repeated so the timing is measurable (~0.1 s)
+BOUNDING_BOX_CALLS = 100000
+
+# Short benchmarks are repeated (up to MAX_REPEATS runs, until MIN_TIME_S of
+# total run time) and the best time is kept, so fast cases are stable enough
+# to compare between runs.
+MIN_TIME_S = 1.0
+MAX_REPEATS = 20
+
+# --compare does not flag cases this short: their timings are mostly noise
+NOISE_FLOOR_S = 0.01
+
+
+def quiet_graph():
+    """Empty Graph that does not print progress messages."""
+    graph = Graph()
+    graph.verbose = False
+    return graph
+
+
+def build_graph(size, seed):
+    """Triangle plus random insertions up to `size` vertices (seeded)."""
+    graph = quiet_graph()
+    graph.start_basic_graph()
+    graph.add_vertices_bulk(count=max(0, size - 3), rng=random.Random(seed))
+    return graph
+
+
+def benchmark_cases(size, seed, modes, full):
+    """
+    Yield (name, setup, run, ops) for every benchmark at one graph size.
+    `setup()` returns the graph the case runs on; `run(graph)` is measured.
+    """
+    def construct(graph):
+        graph.start_basic_graph()
+        graph.add_vertices_bulk(count=max(0, size - 3), rng=random.Random(seed))
+    yield ("construct", quiet_graph, construct, max(0, size - 3))
+
+    # Redraw moves vertices, so every run gets a fresh graph; the read-only
+    # queries share one.
+    def built():
+        return build_graph(size, seed)
+
+    for mode in modes:
+        if not full and size > REDRAW_LIMITS.get(mode, 0):
+            continue
+        yield (f"redraw_{mode}", built, lambda graph, mode=mode: graph.redraw_graph(mode), size)
+
+    shared = []
+
+    def shared_graph():
+        if not shared:
+            shared.append(build_graph(size, seed))
+        return shared[0]
+
+    yield ("statistics", shared_graph, lambda graph: graph.get_graph_statistics(), size)
+    yield ("validate", shared_graph, lambda graph: graph.validate_graph_structure(), size)
+
+    def bounding_boxes(graph):
+        for _ in range(BOUNDING_BOX_CALLS):
+            graph.get_bounding_box()
+    yield ("bounding_box", shared_graph, bounding_boxes, BOUNDING_BOX_CALLS)
+
+
+def measure(setup, run, trace_memory):
+    """
+    Best wall time of `run(setup())`, then (optionally) its peak traced
+    memory on a fresh setup. Memory tracing slows Python code down, so the
+    two are measured in separate runs.
+    """
+    times = []
+    while len(times) < MAX_REPEATS and sum(times) < MIN_TIME_S:
+        graph = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(graph)
+        times.append(time.perf_counter() - start)
+        del graph
+    elapsed = min(times)
+
+    peak = None
+    if trace_memory:
+        graph = setup()
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        run(graph)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+        del graph
+    return elapsed, peak
+
+
+def run_benchmarks(sizes, seed=1, modes=layout.LAYOUT_MODES, full=False, trace_memory=True):
+    """Run every benchmark at every size and return the list of result records."""
+    results = []
+    for size in sizes:
+        for name, setup, run, ops in benchmark_cases(size, seed, modes, full):
+            elapsed, peak = measure(setup, run, trace_memory)
+            record = {
+                'benchmark': name,
+                'vertices': size,
+                'ops': ops,
+                'wall_time_s': elapsed,
+                'ops_per_sec': ops / elapsed if elapsed > 0 else None,
+                'peak_memory_bytes': peak,
+            }
+            results.append(record)
+            memory = f"{peak / 2**20:8.1f} MiB" if peak is not None else ""
+            print(f"{name:>20} {size:>8}  {elapsed:10.4f} s  {record['ops_per_sec'] or 0:14.0f} ops/s  {memory}")
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """
+    Print the time ratio of each benchmark against an earlier JSON run and
+    return the records that are slower by more than `tolerance` (0.2 = 20%).
+    Cases under NOISE_FLOOR_S in either run are shown but never flagged.
+    """
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['vertices']): r for r in json.load(f)['results']}
+
+    regressions = []
+    print(f"\nComparison with {baseline_path}:")
+    for record in results:
+        old = baseline.get((record['benchmark'], record['vertices']))
+        if old is None or not old['wall_time_s']:
+            continue
+        ratio = record['wall_time_s'] / old['wall_time_s']
+        flag = ""
+        if min(record['wall_time_s'], old['wall_time_s']) < NOISE_FLOOR_S:
+            flag = "  (too short to compare)"
+        elif ratio > 1 + tolerance:
+            regressions.append(record)
+            flag = "  REGRESSION"
+        print(f"{record['benchmark']:>20} {record['vertices']:>8}  x{ratio:6.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Graph construction, layout and statistics.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="graph sizes in vertices (default: 1000 10000 100000)")
+    parser.add_argument('--modes', nargs='+', default=list(layout.LAYOUT_MODES),
+                        choices=layout.LAYOUT_MODES, help="redraw layout modes to benchmark")
+    parser.add_argument('--seed', type=int, default=1, help="random seed for graph construction")
+    parser.add_argument('--full', action='store_true',
+                        help="benchmark every redraw mode at every size (ignore REDRAW_LIMITS)")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc runs")
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help="JSON results file")
+    parser.add_argument('--compare', metavar='JSON', help="earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="slowdown ratio above which --compare reports a regression")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.seed, args.modes, args.full, not args.no_memory)
+    report = {
+        'environment': environment(),
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}.")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+# construction_log.py
+import struct
+
+import layout
+
+LOG_MAGIC = b'PTGLOG\0\0'
+LOG_VERSION = 1
+_LOG_HEADER = struct.Struct('<8sI')
+_FLOAT = struct.Struct('<d')
+_POINT = struct.Struct('<dd')
+
+# Record kinds, kept in the low two bits of each record's leading varint
+INSERT, INSERT_AT, REDRAW, SETTINGS = range(4)
+
+# Insertions replayed per add_vertices_bulk call
+REPLAY_BATCH = 1000
+
+
+def _write_varint(buffer, value):
+    while value > 0x7f:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _settings_payload(incremental, mode):
+    return layout.LAYOUT_MODES.index(mode) << 1 | bool(incremental)
+
+
+class ConstructionLog:
+    """
+    Append-only record of how a graph was built on top of the starting
+    triangle: every insertion as its (Vp, Vq) pair, plus the few things
+    that move vertices or change how later insertions are placed (redraws
+    and layout settings).  Layout is deterministic, so replaying the
+    records reproduces the graph exactly, positions included.
+
+    Records are packed into a bytearray: a varint whose low two bits give
+    the kind and the rest its first field, then any further varints or
+    little-endian floats.  An insertion takes 2-6 bytes, against roughly
+    40 for the edges and position it produces.
+    """
+    def __init__(self, incremental=False, mode="force", theta=0.8):
+        # Layout settings in effect when the triangle was created
+        self.start_settings = (bool(incremental), mode, theta)
+        self.data = bytearray()
+        self.steps = 0
+
+    def __len__(self):
+        return self.steps
+
+    def copy(self):
+        other = ConstructionLog(*self.start_settings)
+        other.data = bytearray(self.data)
+        other.steps = self.steps
+        return other
+
+    def mark(self):
+        """Position to cut the log back to with `truncate` (when undoing)."""
+        return len(self.data), self.steps
+
+    def truncate(self, mark):
+        size, steps = mark
+        del self.data[size:]
+        self.steps = steps
+
+    # --- Recording ---
+
+    def append_insertion(self, vp_id, vq_id, position=None):
+        """An insertion over the arc Vp..Vq, with its position if it was given explicitly."""
+        data = self.data
+        if position is None:
+            _write_varint(data, vp_id << 2 | INSERT)
+            _write_varint(data, vq_id)
+        else:
+            _write_varint(data, vp_id << 2 | INSERT_AT)
+            _write_varint(data, vq_id)
+            data += _POINT.pack(position[0], position[1])
+        self.steps += 1
+
+    def append_redraw(self, mode):
+        _write_varint(self.data, layout.LAYOUT_MODES.index(mode) << 2 | REDRAW)
+        self.steps += 1
+
+    def append_settings(self, incremental, mode, theta):
+        _write_varint(self.data, _settings_payload(incremental, mode) << 2 | SETTINGS)
+        self.data += _FLOAT.pack(theta)
+        self.steps += 1
+
+    # --- Reading ---
+
+    def records(self, steps=None):
+        """
+        Yield the first `steps` records (all by default) as (kind, args):
+        INSERT (vp, vq), INSERT_AT (vp, vq, (x, y)), REDRAW (mode,) and
+        SETTINGS (incremental, mode, theta).
+        """
+        for kind, args, _ in self._parse(steps):
+            yield kind, args
+
+    def _parse(self, steps=None):
+        """Like `records`, also yielding the offset just past each record."""
+        data = self.data
+        end = len(data)
+        offset = 0
+        count = 0
+        while offset < end and (steps is None or count < steps):
+            head, offset = _read_varint(data, offset)
+            kind, value = head & 3, head >> 2
+            if kind == INSERT:
+                vq_id, offset = _read_varint(data, offset)
+                args = (value, vq_id)
+            elif kind == INSERT_AT:
+                vq_id, offset = _read_varint(data, offset)
+                args = (value, vq_id, _POINT.unpack_from(data, offset))
+                offset += _POINT.size
+            elif kind == REDRAW:
+                args = (layout.LAYOUT_MODES[value],)
+            else:
+                (theta,) = _FLOAT.unpack_from(data, offset)
+                offset += _FLOAT.size
+                args = (bool(value & 1), layout.LAYOUT_MODES[value >> 1], theta)
+            count += 1
+            yield kind, args, offset
+
+    def replay(self, graph, steps=None, progress=None):
+        """
+        Rebuild `graph` from the starting triangle through the first `steps`
+        records (all by default), with insertions applied in unchecked bulk
+        batches, printing suppressed and nothing re-recorded: the graph's
+        log becomes a copy of the replayed records at the end, and its undo
+        history starts empty (the replayed steps have no log marks to undo
+        back to).  `progress(done, total)` is called after every batch.
+        Returns the graph.
+        """
+        total = self.steps if steps is None else min(steps, self.steps)
+        done = end = 0
+        pairs, positions = [], []
+
+        def flush():
+            nonlocal done
+            if pairs:
+                graph.add_vertices_bulk(pairs, positions=positions if any(positions) else None,
+                                        validate=False)
+                done += len(pairs)
+                pairs.clear()
+                positions.clear()
+                if progress is not None:
+                    progress(done, total)
+
+        # Silence the graph itself: redirecting stdout would also swallow
+        # whatever other threads print while a replay runs in the background
+        verbose, graph.verbose = graph.verbose, False
+        try:
+            # The graph may be the one this log belongs to
+            graph.log = None
+            graph.set_layout_settings(*self.start_settings)
+            graph.start_basic_graph()
+            graph.log = None
+            for kind, args, end in self._parse(total):
+                if kind == INSERT or kind == INSERT_AT:
+                    pairs.append(args[:2])
+                    positions.append(args[2] if kind == INSERT_AT else None)
+                    if len(pairs) >= REPLAY_BATCH:
+                        flush()
+                    continue
+                flush()
+                if kind == REDRAW:
+                    graph.redraw_graph(args[0])
+                else:
+                    graph.set_layout_settings(*args)
+                done += 1
+            flush()
+        finally:
+            graph.verbose = verbose
+        log = ConstructionLog(*self.start_settings)
+        log.data = self.data[:end]
+        log.steps = total
+        graph.log = log
+        graph.history.clear()
+        return graph
+
+    # --- Files ---
+
+    def save(self, path):
+        """Write the log (header, start settings, records) to `path`; returns its size."""
+        start = bytearray()
+        incremental, mode, theta = self.start_settings
+        _write_varint(start, _settings_payload(incremental, mode))
+        start += _FLOAT.pack(theta)
+        with open(path, 'wb') as f:
+            f.write(_LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION))
+            f.write(start)
+            f.write(self.data)
+        return _LOG_HEADER.size + len(start) + len(self.data)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a log written by `save`. A record cut off at the end (say, by
+        a crash while writing) is dropped with a warning; anything that is
+        not a log raises ValueError.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < _LOG_HEADER.size:
+            raise ValueError(f"{path} is not a construction log")
+        magic, version = _LOG_HEADER.unpack_from(data, 0)
+        if magic != LOG_MAGIC:
+            raise ValueError(f"{path} is not a construction log")
+        if version != LOG_VERSION:
+            raise ValueError(f"{path} has unsupported log version {version}")
+        try:
+            settings, offset = _read_varint(data, _LOG_HEADER.size)
+            (theta,) = _FLOAT.unpack_from(data, offset)
+            log = cls(bool(settings & 1), layout.LAYOUT_MODES[settings >> 1], theta)
+        except (IndexError, struct.error):
+            raise ValueError(f"{path} is truncated") from None
+        log.data = bytearray(data[offset + _FLOAT.size:])
+
+        # Count the records, keeping only the complete ones
+        end = 0
+        try:
+            for _, _, end in log._parse():
+                log.steps += 1
+        except (IndexError, struct.error):
+            print(f"Warning: {path} ends in an incomplete record; replaying the first {log.steps} steps.")
+            del log.data[end:]
+        return log
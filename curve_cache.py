@@ -0,0 +1,85 @@
+# curve_cache.py
+import numpy as np
+
+# A curved edge bulges sideways by this fraction of its length, capped at
+# CURVE_MAX_OFFSET world units
+CURVE_FACTOR = 0.05
+CURVE_MAX_OFFSET = 10.0
+# One segment per this many world units of edge length, within the limits
+CURVE_SEGMENT_LENGTH = 30.0
+MIN_CURVE_SEGMENTS = 4
+MAX_CURVE_SEGMENTS = 12
+
+
+def tessellate(x1, y1, x2, y2):
+    """
+    Quadratic Bezier polylines for many edges at once, from endpoint arrays.
+    Returns the flat (x, y) sample arrays and the number of points per edge.
+    """
+    dx, dy = x2 - x1, y2 - y1
+    length = np.hypot(dx, dy)
+    offset = np.minimum(CURVE_MAX_OFFSET, length * CURVE_FACTOR)
+    scale = np.divide(offset, length, out=np.zeros_like(length), where=length > 0)
+    control_x = (x1 + x2) / 2 - dy * scale
+    control_y = (y1 + y2) / 2 + dx * scale
+
+    segments = np.clip((length / CURVE_SEGMENT_LENGTH).astype(np.int64),
+                       MIN_CURVE_SEGMENTS, MAX_CURVE_SEGMENTS)
+    counts = segments + 1
+    owner = np.repeat(np.arange(len(counts)), counts)
+    t = (np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)) / segments[owner]
+    a, b, c = (1 - t) ** 2, 2 * (1 - t) * t, t ** 2
+    xs = a * x1[owner] + b * control_x[owner] + c * x2[owner]
+    ys = a * y1[owner] + b * control_y[owner] + c * y2[owner]
+    return xs, ys, counts
+
+
+class CurveCache:
+    """
+    World-space tessellations of curved edges, keyed by edge.
+
+    An entry remembers the endpoint positions it was computed from and is
+    recomputed only once one of them has moved, so panning and zooming
+    reuse every curve; stale and new edges are tessellated together in one
+    NumPy batch.  The cache is dropped once it holds more than `max_edges`.
+    """
+    def __init__(self, max_edges=100000):
+        self.max_edges = max_edges
+        self._curves = {}
+
+    def polylines(self, edges, xs, ys):
+        """
+        World-space sample points of every edge: flat x and y arrays plus
+        the number of points per edge, in the order of `edges`.
+        """
+        curves = self._curves
+        stale = []
+        for edge in edges:
+            v1_id, v2_id = edge
+            entry = curves.get(edge)
+            if entry is None or entry[0] != (xs[v1_id], ys[v1_id], xs[v2_id], ys[v2_id]):
+                stale.append(edge)
+
+        if stale:
+            if len(curves) + len(stale) > self.max_edges:
+                curves.clear()
+            ends = np.array([(xs[v1_id], ys[v1_id], xs[v2_id], ys[v2_id]) for v1_id, v2_id in stale])
+            sample_x, sample_y, counts = tessellate(ends[:, 0], ends[:, 1], ends[:, 2], ends[:, 3])
+            bounds = np.cumsum(counts).tolist()
+            start = 0
+            for edge, end_pos, stop in zip(stale, ends.tolist(), bounds):
+                curves[edge] = (tuple(end_pos), sample_x[start:stop], sample_y[start:stop])
+                start = stop
+
+        entries = [curves[edge] for edge in edges]
+        if not entries:
+            return np.empty(0), np.empty(0), []
+        return (np.concatenate([entry[1] for entry in entries]),
+                np.concatenate([entry[2] for entry in entries]),
+                [len(entry[1]) for entry in entries])
+
+    def clear(self):
+        self._curves.clear()
+
+    def __len__(self):
+        return len(self._curves)
@@ -0,0 +1,212 @@
+# export.py - Headless tiled high-resolution export of a graph drawing
+#
+# Usage:
+#   python export.py out                          # 8192 px wide image, tiles in out/<z>/<x>/<y>.png, stitched out/graph.png
+#   python export.py out --vertices 100000 --layout tutte --width 32768 --no-stitch
+#   python export.py out --pyramid                # every zoom level down to a single tile
+#
+# Rendering uses the normal Renderer on offscreen surfaces with SDL's dummy
+# video driver, so no display is needed.  Tiles are rendered across a process
+# pool; positions, colors and edges are published once in shared memory and
+# every worker rebuilds its graph from them, instead of receiving the graph
+# with each tile.
+import argparse
+import math
+import os
+import random
+import signal
+import sys
+import time
+from multiprocessing import Pool, shared_memory
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+import layout
+from graph import Graph
+from renderer import Renderer
+
+DEFAULT_TILE_SIZE = 512
+DEFAULT_WIDTH = 8192
+# World-space margin around the bounding box, in vertex radii
+MARGIN_RADII = 2
+
+# Per-process state of the tile workers (set by _init_worker)
+_worker = {}
+
+
+def build_graph(vertices, seed, layout_mode=None):
+    """Triangle plus seeded random insertions, optionally redrawn."""
+    graph = Graph()
+    graph.verbose = False
+    graph.start_basic_graph()
+    graph.add_vertices_bulk(count=max(0, vertices - 3), rng=random.Random(seed))
+    if layout_mode:
+        graph.redraw_graph(layout_mode)
+    graph.verbose = True
+    return graph
+
+
+def world_frame(graph, width):
+    """(min_x, min_y, scale, width, height) mapping the graph onto `width` pixels."""
+    x, y, w, h = graph.get_bounding_box()
+    margin = MARGIN_RADII * float(max(graph.store.radii))
+    x, y, w, h = x - margin, y - margin, w + 2 * margin, h + 2 * margin
+    scale = width / w if w > 0 else 1.0
+    return x, y, scale, width, max(1, int(math.ceil(h * scale)))
+
+
+def tile_jobs(frame, tile_size, levels):
+    """Yield (level, tx, ty, scale, origin_x, origin_y) for every tile of every level."""
+    min_x, min_y, scale, width, height = frame
+    top = levels - 1
+    for level in range(levels):
+        factor = 2 ** (top - level)
+        level_width = max(1, math.ceil(width / factor))
+        level_height = max(1, math.ceil(height / factor))
+        for tx in range(math.ceil(level_width / tile_size)):
+            for ty in range(math.ceil(level_height / tile_size)):
+                yield level, tx, ty, scale / factor, min_x, min_y
+
+
+def pyramid_levels(frame, tile_size):
+    """Zoom levels needed until the whole image fits in one tile."""
+    _, _, _, width, height = frame
+    return max(1, math.ceil(math.log2(max(width, height) / tile_size)) + 1)
+
+
+def _share(array_like):
+    """Copy a buffer into a new shared memory block; returns (block, spec)."""
+    data = memoryview(array_like).cast('B')
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    block.buf[:len(data)] = data
+    return block, (block.name, len(data))
+
+
+def _attach(spec, dtype):
+    """Open a shared block; returns (block, array viewing its contents without a copy)."""
+    name, size = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.frombuffer(block.buf[:size], dtype=dtype)
+
+
+def _init_worker(specs, periphery_ids, custom_colors, tile_size, out_dir, options):
+    """Rebuild the graph from the shared arrays once per worker process."""
+    pygame.init()
+    # SDL turns SIGTERM into a quit event that nothing reads here; restore
+    # the default so the pool can still terminate its workers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # The views stay valid only while their blocks are open, so the blocks
+    # are kept for the worker's lifetime
+    dtypes = {'xs': np.float64, 'ys': np.float64, 'colors': np.int8, 'edge_hi': np.intc, 'edge_lo': np.intc}
+    blocks, arrays = [], {}
+    for key, spec in specs.items():
+        block, arrays[key] = _attach(spec, dtypes[key])
+        blocks.append(block)
+    graph = Graph()
+    graph.load_arrays(arrays['xs'], arrays['ys'], arrays['edge_hi'], arrays['edge_lo'],
+                      periphery_ids, arrays['colors'], custom_colors)
+    renderer = Renderer(None)
+    renderer.show_index = options['labels']
+    renderer.use_curved_edges = options['curves']
+    _worker.update(graph=graph, renderer=renderer, tile_size=tile_size, out_dir=out_dir,
+                   blocks=blocks, arrays=arrays, surface=pygame.Surface((tile_size, tile_size)))
+
+
+def render_tile(job):
+    """Render one tile to <out>/<level>/<tx>/<ty>.png and return its path."""
+    level, tx, ty, scale, origin_x, origin_y = job
+    graph, renderer, surface = _worker['graph'], _worker['renderer'], _worker['surface']
+    tile_size = _worker['tile_size']
+    renderer.zoom_level = scale
+    renderer.pan_offset = [-origin_x * scale - tx * tile_size, -origin_y * scale - ty * tile_size]
+    surface.fill(renderer.background)
+    renderer.draw_graph_on_surface(surface, graph)
+    path = os.path.join(_worker['out_dir'], str(level), str(tx), f"{ty}.png")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pygame.image.save(surface, path)
+    return path
+
+
+def stitch(out_dir, level, frame, tile_size, path):
+    """Assemble the tiles of one level into a single image."""
+    _, _, _, width, height = frame
+    image = pygame.Surface((width, height))
+    for tx in range(math.ceil(width / tile_size)):
+        for ty in range(math.ceil(height / tile_size)):
+            tile = pygame.image.load(os.path.join(out_dir, str(level), str(tx), f"{ty}.png"))
+            image.blit(tile, (tx * tile_size, ty * tile_size))
+    pygame.image.save(image, path)
+
+
+def export(graph, out_dir, width=DEFAULT_WIDTH, tile_size=DEFAULT_TILE_SIZE, pyramid=False,
+           stitched=True, workers=None, labels=True, curves=False):
+    """
+    Render `graph` into PNG tiles under `out_dir` (level/x/y.png, the full
+    resolution level being the highest) and, if `stitched`, assemble the full
+    resolution tiles into out_dir/graph.png. Returns the number of tiles.
+    """
+    if len(graph.store) == 0:
+        raise ValueError("Cannot export an empty graph")
+    frame = world_frame(graph, width)
+    levels = pyramid_levels(frame, tile_size) if pyramid else 1
+    jobs = list(tile_jobs(frame, tile_size, levels))
+    os.makedirs(out_dir, exist_ok=True)
+
+    edge_hi, edge_lo = graph.adjacency.edge_arrays()
+    blocks, specs = [], {}
+    try:
+        for key, data in (('xs', graph.store.xs), ('ys', graph.store.ys), ('colors', graph.store.color_numbers),
+                          ('edge_hi', edge_hi), ('edge_lo', edge_lo)):
+            block, specs[key] = _share(data)
+            blocks.append(block)
+        initargs = (specs, list(graph.periphery), graph.store.custom_colors, tile_size, out_dir,
+                    {'labels': labels, 'curves': curves})
+        with Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            for done, _ in enumerate(pool.imap_unordered(render_tile, jobs, chunksize=4), 1):
+                if done % 100 == 0 or done == len(jobs):
+                    print(f"Rendered {done}/{len(jobs)} tiles")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    if stitched:
+        path = os.path.join(out_dir, "graph.png")
+        stitch(out_dir, levels - 1, frame, tile_size, path)
+        print(f"Stitched {frame[3]}x{frame[4]} image written to {path}")
+    return len(jobs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the graph drawing as PNG tiles without a display.")
+    parser.add_argument('output', help="output directory")
+    parser.add_argument('--vertices', type=int, default=10000, help="graph size (default: 10000)")
+    parser.add_argument('--seed', type=int, default=1, help="random seed for graph construction")
+    parser.add_argument('--layout', choices=layout.LAYOUT_MODES, help="redraw the graph with this layout first")
+    parser.add_argument('--width', type=int, default=DEFAULT_WIDTH,
+                        help="width of the full resolution image in pixels (default: 8192)")
+    parser.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE, help="tile edge in pixels")
+    parser.add_argument('--pyramid', action='store_true',
+                        help="also render every coarser zoom level down to a single tile")
+    parser.add_argument('--no-stitch', action='store_true', help="only write the tiles")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--no-labels', action='store_true', help="do not draw vertex labels")
+    parser.add_argument('--curves', action='store_true', help="draw curved edges")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    graph = build_graph(args.vertices, args.seed, args.layout)
+    print(f"Built graph with {len(graph.store)} vertices in {time.perf_counter() - start:.1f} s")
+
+    start = time.perf_counter()
+    tiles = export(graph, args.output, args.width, args.tile_size, args.pyramid, not args.no_stitch,
+                   args.workers, not args.no_labels, args.curves)
+    print(f"Exported {tiles} tiles to {args.output} in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# frame_profiler.py
+import csv
+import time
+from collections import deque
+
+import numpy as np
+
+
+class FrameProfiler:
+    """
+    Per-stage frame timings.
+
+    A frame is bracketed by `begin_frame()` / `end_frame()`; inside it each
+    `lap(stage)` charges the time since the previous lap (or the start of
+    the frame) to `stage`, so instrumenting code is one call per stage
+    boundary.  Stages hit several times in a frame accumulate.  While
+    disabled every call returns immediately.
+
+    The last `history` frames are kept for `dump_csv()`; `percentiles()`
+    summarizes the most recent `window` of them for the on-screen overlay.
+    Frames ended with `idle=True` (nothing was drawn) only keep their total,
+    in a separate window, so they do not dilute the drawn-frame timings.
+    """
+    def __init__(self, window=300, history=100000):
+        self.enabled = False
+        self.window = window
+        self.frames = deque(maxlen=history)
+        self.idle_frames = deque(maxlen=window)
+        self.stages = []
+        self._frame = None
+        self._frame_start = 0.0
+        self._last = 0.0
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._frame = {}
+        self._frame_start = self._last = time.perf_counter()
+
+    def lap(self, stage=None):
+        """Charge the time since the last lap to `stage` (None just restarts the clock)."""
+        if self._frame is None:
+            return
+        now = time.perf_counter()
+        if stage is not None:
+            frame = self._frame
+            if stage not in frame:
+                frame[stage] = 0.0
+                if stage not in self.stages:
+                    self.stages.append(stage)
+            frame[stage] += now - self._last
+        self._last = now
+
+    def end_frame(self, idle=False):
+        if self._frame is None:
+            return
+        total = time.perf_counter() - self._frame_start
+        if idle:
+            self.idle_frames.append(total)
+        else:
+            self.frames.append((total, self._frame))
+        self._frame = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if not self.enabled:
+            self._frame = None
+        return self.enabled
+
+    def clear(self):
+        self.frames.clear()
+        self.idle_frames.clear()
+        self.stages = []
+
+    def percentiles(self, quantiles=(50, 95, 99)):
+        """
+        [(stage, count, [ms per quantile])] over the recent window, with the
+        whole drawn frame first as 'frame' and idle frames next as 'idle'.
+        Stages only count the drawn frames they ran in.
+        """
+        recent = list(self.frames)[-self.window:]
+        rows = [('frame', [total for total, _ in recent]), ('idle', list(self.idle_frames))]
+        for stage in self.stages:
+            samples = [frame[stage] for _, frame in recent if stage in frame]
+            rows.append((stage, samples))
+        rows = [(stage, samples) for stage, samples in rows if samples]
+        return [(stage, len(samples), (np.percentile(samples, quantiles) * 1000).tolist())
+                for stage, samples in rows]
+
+    def dump_csv(self, path):
+        """Write every kept drawn frame as one row of milliseconds per stage; returns the row count."""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'total_ms'] + [f"{stage}_ms" for stage in self.stages])
+            for i, (total, frame) in enumerate(self.frames):
+                row = [i, f"{total * 1000:.3f}"]
+                row.extend(f"{frame[stage] * 1000:.3f}" if stage in frame else ''
+                           for stage in self.stages)
+                writer.writerow(row)
+        return len(self.frames)
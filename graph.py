@@ -1,15 +1,59 @@
 # graph.py (Completed)
-from vertex import Vertex
+from vertex import VertexStore, VertexMapping
+from periphery import Periphery
+from adjacency import Adjacency
+from spatial_index import SpatialIndex
+from construction_log import ConstructionLog
+from undo_history import UndoHistory
+import layout
+import snapshot
+import graph_io
+import itertools
 import math
 import random
+import numpy as np
+
+# Serial numbers telling Graph instances apart in revision tokens
+_graph_serials = itertools.count(1)
 
 class Graph:
     """Manages all graph data and logic."""
     def __init__(self):
-        self.vertices = {}
-        self.edges = set()
-        self.periphery = []
+        # Vertex data lives in contiguous arrays; `vertices` maps id -> Vertex view
+        self.serial = next(_graph_serials)
+        self.store = VertexStore()
+        self.vertices = VertexMapping(self.store)
+        self.adjacency = Adjacency()
+        self.periphery = Periphery()
+        # World-space grid over the vertices for hit-testing; kept in sync
+        # lazily with insertions, moves and redraws
+        self.spatial_index = SpatialIndex(self.store, self.adjacency)
         self.next_vertex_id = 1
+        # Redraw layout mode (see layout.LAYOUT_MODES); theta trades accuracy
+        # for speed in Barnes-Hut mode (0 = exact, ~1 = fast)
+        self.layout_mode = "force"
+        self.barnes_hut_theta = 0.8
+        # Incremental layout: relax only the neighborhood of each insertion
+        # and run a global pass only when the layout quality degrades.
+        # Quality is checked each time the graph has grown by
+        # `layout_check_growth`, and the pass always uses the near-linear
+        # `global_pass_mode` (not the O(V^2) force layout), so checks and
+        # global passes stay linear in the total work.
+        self.incremental_layout = False
+        self.local_relax_sweeps = 3
+        self.local_relax_hops = 2
+        self.layout_check_growth = 1.25
+        self.max_layout_spread = 6.0
+        self.global_pass_mode = "tutte"
+        self._layout_checked_at = 0
+        # Record of every operation since start_basic_graph, for replay (None
+        # for graphs that were not built here, e.g. loaded from arrays)
+        self.log = None
+        # Inverse deltas of the operations since then (see undo)
+        self.history = UndoHistory()
+        self._undo_entry = None
+        # Progress and error messages go to stdout only while this is set
+        self.verbose = True
         # Color palette system (1-4 natural numbers)
         self.color_palette = {
             1: (255, 100, 100),  # Red
@@ -18,99 +62,233 @@ class Graph:
             4: (255, 255, 100)   # Yellow
         }
 
+    @property
+    def edges(self):
+        """Set-like view of the edges as sorted (u, v) tuples."""
+        return self.adjacency.edge_view
+
+    def _say(self, message):
+        if self.verbose:
+            print(message)
+
+    def revision(self):
+        """
+        Token that changes whenever anything drawable in the graph changes,
+        and differs between graphs (a finished task swaps in a new one).
+        """
+        return self.serial, self.store.revision, len(self.adjacency)
+
+    def move_vertex(self, v_id, x, y):
+        """Move a single vertex, keeping the position aggregates up to date."""
+        self.store.set_pos(v_id, x, y)
+
+    def get_center(self):
+        """Centroid of all vertex positions (O(1) via running aggregates)."""
+        if not self.vertices:
+            return 0, 0
+        return self.store.center()
+
     def get_bounding_box(self):
         if not self.vertices:
             return 0, 0, 800, 600
-        x_coords = [v.pos[0] for v in self.vertices.values()]
-        y_coords = [v.pos[1] for v in self.vertices.values()]
-        min_x, max_x = min(x_coords), max(x_coords)
-        min_y, max_y = min(y_coords), max(y_coords)
+        min_x, min_y, max_x, max_y = self.store.extents()
         return min_x, min_y, max_x - min_x, max_y - min_y
 
     def start_basic_graph(self):
         """Implements the 'S' command to start with a basic triangle."""
-        self.vertices.clear()
-        self.edges.clear()
+        self.store.clear()
+        self.adjacency.clear()
         self.periphery.clear()
+        self._layout_checked_at = 0
         
         # Create initial triangle with different colors
-        v1 = Vertex(1, 400, 200, color_number=1)
-        v2 = Vertex(2, 250, 450, color_number=2)
-        v3 = Vertex(3, 550, 450, color_number=3)
+        self.store.add(1, 400, 200, color_number=1)
+        self.store.add(2, 250, 450, color_number=2)
+        self.store.add(3, 550, 450, color_number=3)
         
-        self.vertices = {1: v1, 2: v2, 3: v3}
-        self.edges.add(tuple(sorted((1, 2))))
-        self.edges.add(tuple(sorted((2, 3))))
-        self.edges.add(tuple(sorted((3, 1))))
+        self.adjacency.add_edge(1, 2)
+        self.adjacency.add_edge(2, 3)
+        self.adjacency.add_edge(3, 1)
         
-        self.periphery = [1, 2, 3] # Clockwise order
+        self.periphery.reset([1, 2, 3]) # Clockwise order
         self.next_vertex_id = 4
-        print("Started basic graph with triangle V1-V2-V3.")
+        self.log = ConstructionLog(self.incremental_layout, self.layout_mode, self.barnes_hut_theta)
+        self.history.clear()
+        self._say("Started basic graph with triangle V1-V2-V3.")
+
+    def load_arrays(self, xs, ys, edge_hi, edge_lo, periphery_ids, color_numbers=None, custom_colors=None):
+        """
+        Replace the whole graph from flat arrays: positions (and optional
+        color numbers) laid out by id with slot 0 unused, (larger, smaller)
+        endpoint edge arrays, and the periphery in clockwise order.
+        """
+        self.store.load(xs, ys, color_numbers, custom_colors)
+        self.adjacency.load_edges(edge_hi, edge_lo)
+        self.periphery.reset(list(periphery_ids))
+        self.next_vertex_id = len(self.store) + 1
+        self._layout_checked_at = 0
+        self.log = None
+        self.history.clear()
+
+    def save_snapshot(self, path):
+        """Write the graph to a binary snapshot file; returns its size in bytes."""
+        return snapshot.save(self, path)
+
+    def load_snapshot(self, path):
+        """
+        Replace the graph with a snapshot file written by `save_snapshot`.
+        Neighbor arrays, the spatial index and aggregates are rebuilt lazily.
+        """
+        snapshot.load(path, self)
+
+    def export_file(self, path):
+        """Stream the graph to a .csv, .jsonl or .graphml file (see graph_io)."""
+        graph_io.save(self, path)
+
+    def import_file(self, path):
+        """Replace the graph with a file written by `export_file`, read as a stream."""
+        graph_io.load(path, self)
+
+    def copy(self, data=True):
+        """
+        Independent copy of the graph with the same layout settings; with
+        `data` False the copy starts empty.
+        """
+        other = Graph()
+        for name in ('layout_mode', 'barnes_hut_theta', 'incremental_layout', 'local_relax_sweeps',
+                     'local_relax_hops', 'layout_check_growth', 'max_layout_spread', 'global_pass_mode',
+                     'verbose'):
+            setattr(other, name, getattr(self, name))
+        if data and self.vertices:
+            edge_hi, edge_lo = self.adjacency.edge_arrays()
+            other.load_arrays(self.store.xs, self.store.ys, edge_hi, edge_lo, list(self.periphery),
+                              self.store.color_numbers, self.store.custom_colors)
+            other.log = self.log.copy() if self.log is not None else None
+            other.history = self.history.copy()
+        return other
 
     def add_vertex_to_periphery(self, vp_id, vq_id):
         """Implements the logic for adding a new vertex to the periphery[cite: 20]."""
         if vp_id == vq_id:
-            print("Error: Vp and Vq cannot be the same vertex.")
+            self._say("Error: Vp and Vq cannot be the same vertex.")
             return
 
         if vp_id not in self.periphery or vq_id not in self.periphery:
-            print("Error: Selected vertices must be on the periphery.")
+            self._say("Error: Selected vertices must be on the periphery.")
             return
 
-        p_idx = self.periphery.index(vp_id)
-        q_idx = self.periphery.index(vq_id)
-        
-        if p_idx < q_idx:
-            target_arc = self.periphery[p_idx : q_idx + 1]
-        else: # Wrap around case
-            target_arc = self.periphery[p_idx:] + self.periphery[:q_idx + 1]
+        new_v_id, target_arc = self._insert_vertex(vp_id, vq_id)
+        self._say(f"Added vertex {new_v_id} connected to {target_arc}.")
 
-        if len(target_arc) < 2:
-            print("Error: Invalid arc selection.")
-            return
-            
-        new_pos_x, new_pos_y = self._calculate_outward_pos(target_arc)
+    def _insert_vertex(self, vp_id, vq_id, position=None):
+        """
+        Add a vertex covering the periphery arc Vp..Vq (both already checked
+        to be distinct periphery vertices).  Places it outward of the arc
+        unless a position is given.  Returns (new id, arc).
+        """
+        entry = self._undo_entry = self._new_undo_entry('insert', vp=vp_id, vq=vq_id, position=position,
+                                                        head=self.periphery.head,
+                                                        checked_at=self._layout_checked_at)
+        if self.log is not None:
+            self.log.append_insertion(vp_id, vq_id, position)
+        # Walk the ring clockwise from Vp to Vq (wraps around naturally)
+        target_arc = self.periphery.arc(vp_id, vq_id)
+        if position is None:
+            position = self._calculate_outward_pos(target_arc)
 
         new_v_id = self.next_vertex_id
         # Assign color based on vertex ID (cycle through 1-4)
         color_number = ((new_v_id - 1) % 4) + 1
-        new_vertex = Vertex(new_v_id, new_pos_x, new_pos_y, color_number=color_number)
-        self.vertices[new_v_id] = new_vertex
-        
-        for vid in target_arc:
-            self.edges.add(tuple(sorted((new_v_id, vid))))
-
-        interior_arc = target_arc[1:-1]
-        new_periphery = [v_id for v_id in self.periphery if v_id not in interior_arc]
-        vp_idx_in_new = new_periphery.index(vp_id)
-        new_periphery.insert(vp_idx_in_new + 1, new_v_id)
-        self.periphery = new_periphery
+        self.store.add(new_v_id, position[0], position[1], color_number=color_number)
         
+        self.adjacency.connect_new_vertex(new_v_id, target_arc)
+
+        # Replace the covered part of the contour with the new vertex
+        enclosed = self.periphery.splice(vp_id, vq_id, new_v_id)
         self.next_vertex_id += 1
-        print(f"Added vertex {new_v_id} connected to {target_arc}.")
 
-    def add_random_vertex(self):
+        if self.incremental_layout:
+            region = self._relax_region(new_v_id)
+            xs, ys = self.store.xs, self.store.ys
+            entry['moved'] = [(v_id, xs[v_id], ys[v_id]) for v_id in region]
+            self._relax_locally(region)
+            self._check_layout_quality()
+        self._undo_entry = None
+        self._record(entry)
+        return new_v_id, target_arc
+
+    def add_random_vertex(self, rng=None):
         """Implements the 'R' command[cite: 19]."""
         if len(self.periphery) < 2:
-            print("Not enough vertices to add a random one.")
+            self._say("Not enough vertices to add a random one.")
             return
         
-        vp_id, vq_id = random.sample(self.periphery, 2)
+        vp_id, vq_id = self.periphery.sample_pair(rng or random)
         self.add_vertex_to_periphery(vp_id, vq_id)
 
+    def add_vertices_bulk(self, pairs=None, count=None, rng=None, positions=None,
+                          progress=None, progress_interval=1000, validate=True):
+        """
+        Insert many vertices without per-insertion logging.
+
+        Either `pairs` (any iterable of (vp, vq) periphery pairs, applied in
+        order) or `count` random insertions drawn with `rng` (a
+        random.Random; seed it for reproducible graphs) must be given.
+        `positions` optionally supplies an (x, y) for each new vertex in
+        order, skipping the outward placement.  `progress(done, total)` is
+        called every `progress_interval` insertions and once at the end
+        (total is None when an iterable of unknown length is given).
+        `validate=False` skips the periphery checks for pairs known to be
+        valid (e.g. replayed from a construction log).
+
+        The insertions (and anything `progress` does to the graph, like the
+        periodic redraws of generate_large_graph) are undone as one step.
+
+        Returns the range of the new vertex ids.
+        """
+        if (pairs is None) == (count is None):
+            raise ValueError("Give either pairs or count")
+        if count is not None:
+            if len(self.periphery) < 2:
+                raise ValueError("Not enough vertices to add random ones")
+            rng = rng or random
+            sample_pair = self.periphery.sample_pair
+            pairs = (sample_pair(rng) for _ in range(count))
+            total = count
+        else:
+            total = len(pairs) if hasattr(pairs, '__len__') else None
+        positions = iter(positions) if positions is not None else None
+
+        first_id = self.next_vertex_id
+        done = 0
+        self.history.begin_group('bulk')
+        try:
+            for vp_id, vq_id in pairs:
+                if validate and (vp_id == vq_id or vp_id not in self.periphery or vq_id not in self.periphery):
+                    raise ValueError(f"Invalid periphery pair ({vp_id}, {vq_id}) at insertion {done}")
+                position = next(positions) if positions is not None else None
+                self._insert_vertex(vp_id, vq_id, position)
+                done += 1
+                if progress is not None and done % progress_interval == 0:
+                    progress(done, total)
+            if progress is not None and done % progress_interval != 0:
+                progress(done, total)
+        finally:
+            self.history.end_group()
+        return range(first_id, self.next_vertex_id)
+
     def _calculate_outward_pos(self, arc_ids):
         """
         Calculates an outward position for a new vertex to maintain a convex contour and regular shape.
         """
-        arc_points = [self.vertices[vid].pos for vid in arc_ids]
+        xs, ys = self.store.xs, self.store.ys
         
         # 1. Find the center of the arc
-        center_x = sum(p[0] for p in arc_points) / len(arc_points)
-        center_y = sum(p[1] for p in arc_points) / len(arc_points)
+        center_x = sum([xs[vid] for vid in arc_ids]) / len(arc_ids)
+        center_y = sum([ys[vid] for vid in arc_ids]) / len(arc_ids)
 
         # 2. Find the center of the entire graph
-        graph_center_x = sum(v.pos[0] for v in self.vertices.values()) / len(self.vertices)
-        graph_center_y = sum(v.pos[1] for v in self.vertices.values()) / len(self.vertices)
+        graph_center_x, graph_center_y = self.get_center()
 
         # 3. Create a vector pointing from the graph center to the arc center
         direction_x = center_x - graph_center_x
@@ -125,10 +303,9 @@ class Graph:
         # 5. Place the new vertex along this vector, at a distance
         # calculated from the average edge length of the arc.
         avg_dist = 0
-        if len(arc_points) > 1:
-            p1 = arc_points[0]
-            p2 = arc_points[-1]
-            avg_dist = math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2) / 2
+        if len(arc_ids) > 1:
+            first, last = arc_ids[0], arc_ids[-1]
+            avg_dist = math.hypot(xs[first] - xs[last], ys[first] - ys[last]) / 2
         
         distance_factor = max(avg_dist, 80) # Ensure a minimum distance
 
@@ -137,95 +314,294 @@ class Graph:
         
         return new_x, new_y
     
-    def redraw_graph(self):
+    def redraw_graph(self, mode=None, progress=None):
         """
         Implements the redraw command to optimize vertex positions and edge lengths.
         Redistributes vertices to maintain convex contour and equal distances.
+        Uses `self.layout_mode` unless a mode is given; `progress(done, total)`
+        is called after every layout iteration.
         """
+        mode = mode or self.layout_mode
+        if mode not in layout.LAYOUT_MODES:
+            self._say(f"Error: Unknown layout mode '{mode}'.")
+            return
         if len(self.vertices) < 3:
             return
         
-        print("Redrawing graph for optimal layout...")
-        
+        self._say(f"Redrawing graph for optimal layout ({mode})...")
+        entry = self._undo_entry = self._new_undo_entry('redraw', mode=mode)
+        self._redraw_layout(mode, progress)
+        self._undo_entry = None
+        self._record(entry)
+        if self.log is not None:
+            self.log.append_redraw(mode)
+
+    def _redraw_layout(self, mode, progress=None):
+        """The redraw itself (not recorded in the construction log)."""
         # Find the graph center
-        center_x = sum(v.pos[0] for v in self.vertices.values()) / len(self.vertices)
-        center_y = sum(v.pos[1] for v in self.vertices.values()) / len(self.vertices)
+        center_x, center_y = self.get_center()
         
-        # Calculate average edge length for scaling
-        total_edge_length = 0
-        edge_count = 0
-        for v1_id, v2_id in self.edges:
-            v1_pos = self.vertices[v1_id].pos
-            v2_pos = self.vertices[v2_id].pos
-            length = math.sqrt((v1_pos[0] - v2_pos[0])**2 + (v1_pos[1] - v2_pos[1])**2)
-            total_edge_length += length
-            edge_count += 1
+        xs, ys = layout.store_positions(self.store)
+        edge_hi, edge_lo = layout.edge_arrays(self.adjacency)
         
-        avg_edge_length = total_edge_length / edge_count if edge_count > 0 else 100
+        # Calculate average edge length for scaling
+        avg_edge_length = layout.average_edge_length(xs, ys, edge_hi, edge_lo) or 100
         
         # Redraw periphery vertices in a regular pattern
-        if len(self.periphery) > 0:
-            radius = max(150, avg_edge_length * len(self.periphery) / (2 * math.pi))
-            
-            for i, v_id in enumerate(self.periphery):
-                angle = 2 * math.pi * i / len(self.periphery)
-                new_x = center_x + radius * math.cos(angle)
-                new_y = center_y + radius * math.sin(angle)
-                self.vertices[v_id].pos = (new_x, new_y)
-        
-        # Adjust interior vertices using force-based layout
-        interior_vertices = [v_id for v_id in self.vertices.keys() if v_id not in self.periphery]
-        
-        for _ in range(50):  # Iteration limit for force simulation
-            forces = {v_id: [0, 0] for v_id in interior_vertices}
-            
-            # Repulsive forces between all interior vertices
-            for i, v1_id in enumerate(interior_vertices):
-                for v2_id in interior_vertices[i+1:]:
-                    v1_pos = self.vertices[v1_id].pos
-                    v2_pos = self.vertices[v2_id].pos
-                    
-                    dx = v1_pos[0] - v2_pos[0]
-                    dy = v1_pos[1] - v2_pos[1]
-                    distance = math.sqrt(dx*dx + dy*dy)
-                    
-                    if distance > 0:
-                        force_magnitude = avg_edge_length * avg_edge_length / (distance * distance)
-                        force_x = force_magnitude * dx / distance
-                        force_y = force_magnitude * dy / distance
-                        
-                        forces[v1_id][0] += force_x
-                        forces[v1_id][1] += force_y
-                        forces[v2_id][0] -= force_x
-                        forces[v2_id][1] -= force_y
-            
-            # Attractive forces along edges
-            for v1_id, v2_id in self.edges:
-                if v1_id in interior_vertices and v2_id in interior_vertices:
-                    v1_pos = self.vertices[v1_id].pos
-                    v2_pos = self.vertices[v2_id].pos
-                    
-                    dx = v2_pos[0] - v1_pos[0]
-                    dy = v2_pos[1] - v1_pos[1]
-                    distance = math.sqrt(dx*dx + dy*dy)
-                    
-                    if distance > 0:
-                        force_magnitude = (distance - avg_edge_length) * 0.1
-                        force_x = force_magnitude * dx / distance
-                        force_y = force_magnitude * dy / distance
-                        
-                        forces[v1_id][0] += force_x
-                        forces[v1_id][1] += force_y
-                        forces[v2_id][0] -= force_x
-                        forces[v2_id][1] -= force_y
-            
-            # Apply forces with damping
-            for v_id in interior_vertices:
-                current_pos = self.vertices[v_id].pos
-                new_x = current_pos[0] + forces[v_id][0] * 0.1
-                new_y = current_pos[1] + forces[v_id][1] * 0.1
-                self.vertices[v_id].pos = (new_x, new_y)
+        periphery_ids = np.fromiter(self.periphery, dtype=np.int64, count=len(self.periphery))
+        if len(periphery_ids) > 0:
+            radius = max(150, avg_edge_length * len(periphery_ids) / (2 * math.pi))
+            layout.place_on_circle(xs, ys, periphery_ids, (center_x, center_y), radius)
+        
+        interior = np.ones(len(xs), dtype=bool)
+        interior[0] = False
+        interior[periphery_ids] = False
+        if mode == "tutte":
+            # Solve for the barycentric (crossing-free) interior directly,
+            # warm-started from the current positions
+            iterations, converged = layout.tutte_embedding(xs, ys, np.flatnonzero(interior),
+                                                           edge_hi, edge_lo, progress=progress)
+            if converged:
+                self._say(f"Tutte solve converged in {iterations} iterations.")
+            else:
+                self._say(f"Warning: Tutte solve did not converge in {iterations} iterations; "
+                      "the layout may have crossings.")
+        else:
+            # Adjust interior vertices using force-based layout
+            theta = self.barnes_hut_theta if mode == "barnes_hut" else None
+            layout.force_directed(xs, ys, np.flatnonzero(interior), edge_hi, edge_lo,
+                                  avg_edge_length, iterations=50, theta=theta, progress=progress)
+        
+        # replace_positions swaps in new arrays, so undo can keep the old ones
+        if self._undo_entry is not None and 'positions' not in self._undo_entry:
+            self._undo_entry['positions'] = (self.store.xs, self.store.ys)
+        self.store.replace_positions(xs, ys)
+    
+    def _relax_region(self, new_v_id):
+        """
+        The new vertex and the interior vertices within `local_relax_hops`
+        edges of it.  Other periphery vertices stay put: pulling the contour
+        to its barycenters would collapse the drawing.
+        """
+        region = [new_v_id]
+        seen = {new_v_id}
+        frontier = [new_v_id]
+        for _ in range(self.local_relax_hops):
+            reached = []
+            for v_id in frontier:
+                for n_id in self.adjacency.neighbors(v_id):
+                    if n_id not in seen:
+                        seen.add(n_id)
+                        reached.append(n_id)
+            region.extend(n_id for n_id in reached if n_id not in self.periphery)
+            frontier = reached
+        return region
+
+    def _relax_locally(self, region):
+        """
+        Gauss-Seidel barycentric sweeps over a region around a new vertex
+        (see `_relax_region`); the cost follows the size of the region, not
+        of the graph.
+        """
+        xs, ys = self.store.xs, self.store.ys
+        for _ in range(self.local_relax_sweeps):
+            for v_id in region:
+                neighbors = self.adjacency.neighbors(v_id)
+                count = len(neighbors)
+                sum_x = sum_y = 0.0
+                for n_id in neighbors:
+                    sum_x += xs[n_id]
+                    sum_y += ys[n_id]
+                self.store.set_pos(v_id, sum_x / count, sum_y / count)
+
+    def layout_spread(self):
+        """
+        Bounding box diagonal relative to sqrt(V) average edge lengths: about
+        1-3 for a compact drawing, growing as insertions push the contour out.
+        """
+        xs, ys = layout.store_positions(self.store)
+        edge_hi, edge_lo = layout.edge_arrays(self.adjacency)
+        avg_edge_length = layout.average_edge_length(xs, ys, edge_hi, edge_lo)
+        if not avg_edge_length:
+            return 0.0
+        min_x, min_y, max_x, max_y = self.store.extents()
+        return math.hypot(max_x - min_x, max_y - min_y) / (avg_edge_length * math.sqrt(len(self.vertices)))
+
+    def _check_layout_quality(self):
+        """Run a global redraw if the layout has degraded since the last check."""
+        if len(self.vertices) < self._layout_checked_at * self.layout_check_growth:
+            return
+        self._layout_checked_at = len(self.vertices)
+        spread = self.layout_spread()
+        if spread > self.max_layout_spread:
+            self._say(f"Layout spread {spread:.1f} exceeds {self.max_layout_spread}; "
+                      f"running a global {self.global_pass_mode} pass.")
+            # Part of the insertion that triggered it, so not logged on its own
+            self._redraw_layout(self.global_pass_mode)
+
+    def toggle_incremental_layout(self):
+        """Switch incremental layout on or off and return the new state."""
+        self.set_layout_settings(incremental=not self.incremental_layout)
+        return self.incremental_layout
+
+    def cycle_layout_mode(self):
+        """Switch to the next redraw layout mode and return its name."""
+        index = layout.LAYOUT_MODES.index(self.layout_mode)
+        self.set_layout_settings(mode=layout.LAYOUT_MODES[(index + 1) % len(layout.LAYOUT_MODES)])
+        return self.layout_mode
+
+    def set_layout_settings(self, incremental=None, mode=None, theta=None):
+        """
+        Change the layout settings (None keeps a setting). They decide how
+        later insertions and redraws place vertices, so they are logged.
+        """
+        self._record(self._new_undo_entry(
+            'settings', old=(self.incremental_layout, self.layout_mode, self.barnes_hut_theta,
+                             self._layout_checked_at),
+            new=(incremental, mode, theta)))
+        if incremental is not None and incremental != self.incremental_layout:
+            self.incremental_layout = incremental
+            self._layout_checked_at = len(self.vertices)
+        if mode is not None:
+            self.layout_mode = mode
+        if theta is not None:
+            self.barnes_hut_theta = theta
+        if self.log is not None:
+            self.log.append_settings(self.incremental_layout, self.layout_mode, self.barnes_hut_theta)
     
+    # --- Undo / redo ---
+
+    def _new_undo_entry(self, kind, **fields):
+        """Undo entry for an operation about to run, with what every kind needs."""
+        fields['kind'] = kind
+        fields['aggregates'] = self.store.aggregates()
+        fields['log_mark'] = self.log.mark() if self.log is not None else None
+        return fields
+
+    def _record(self, entry):
+        """
+        Record a finished undo entry.  A group (see add_vertices_bulk) is
+        only ever undone whole, which needs nothing from after its first
+        position snapshot: later entries drop their snapshots and moved
+        positions, and all of them leave the aggregates and log mark (the
+        state before the group) to the group.
+        """
+        group = self.history.group
+        if group is not None:
+            if not group['entries']:
+                group['aggregates'], group['log_mark'] = entry['aggregates'], entry['log_mark']
+            del entry['aggregates'], entry['log_mark']
+            if group.get('snapshot'):
+                entry.pop('positions', None)
+                entry.pop('moved', None)
+            elif 'positions' in entry:
+                group['snapshot'] = True
+        self.history.record(entry)
+
+    def undo(self):
+        """
+        Reverse the most recent insertion, bulk insertion, redraw or layout
+        setting change from its recorded delta: an insertion costs O(arc
+        length), a redraw O(V), a bulk insertion the sum of its parts.
+        Returns the kind of operation undone, or None if there was nothing
+        to undo.
+        """
+        entry = self.history.pop_undo()
+        if entry is None:
+            return None
+        kind = entry['kind']
+        redo_entry = entry
+        if kind == 'insert':
+            self._undo_insertion(entry)
+        elif kind == 'redraw':
+            # Keep the redrawn positions so redo does not run the layout again
+            redo_entry = dict(entry, redrawn=(self.store.xs, self.store.ys))
+            self.store.replace_positions(*entry['positions'])
+        elif kind == 'bulk':
+            # Copies: undoing the insertions changes the arrays in place
+            redo_entry = dict(entry, redrawn=(self.store.xs[:], self.store.ys[:]),
+                              redrawn_aggregates=self.store.aggregates())
+            for part in reversed(entry['entries']):
+                if part['kind'] == 'insert':
+                    self._undo_insertion(part)
+                elif 'positions' in part:
+                    self.store.replace_positions(*part['positions'])
+        else:
+            incremental, mode, theta, checked_at = entry['old']
+            self.incremental_layout, self.layout_mode, self.barnes_hut_theta = incremental, mode, theta
+            self._layout_checked_at = checked_at
+        self.store.restore_aggregates(entry['aggregates'])
+        if self.log is not None and entry['log_mark'] is not None:
+            self.log.truncate(entry['log_mark'])
+        self.history.push_redo(redo_entry)
+        return kind
+
+    def _undo_insertion(self, entry):
+        new_v_id = self.next_vertex_id - 1
+        # Positions first, newest change first: a global pass the insertion
+        # triggered, then the local relaxation
+        if 'positions' in entry:
+            self.store.replace_positions(*entry['positions'])
+        for v_id, x, y in reversed(entry.get('moved', ())):
+            self.store.set_pos(v_id, x, y)
+        self.spatial_index.discard_last_vertex(new_v_id)
+        arc = self.adjacency.remove_last_vertex(new_v_id)
+        self.periphery.unsplice(arc[0], arc[-1], new_v_id, arc[1:-1], entry['head'])
+        self.store.pop()
+        self.next_vertex_id = new_v_id
+        self._layout_checked_at = entry['checked_at']
+
+    def redo(self):
+        """
+        Re-apply the most recently undone operation. Returns its kind, or
+        None if there was nothing to redo.
+        """
+        entry = self.history.pop_redo()
+        if entry is None:
+            return None
+        kind = entry['kind']
+        self.history.redoing = True
+        try:
+            if kind == 'insert':
+                # Everything the placement depends on is back as it was, so
+                # the vertex lands exactly where it did the first time
+                self._insert_vertex(entry['vp'], entry['vq'], entry['position'])
+            elif kind == 'redraw':
+                self._record(self._new_undo_entry('redraw', mode=entry['mode'],
+                                                  positions=(self.store.xs, self.store.ys)))
+                self.store.replace_positions(*entry['redrawn'])
+                if self.log is not None:
+                    self.log.append_redraw(entry['mode'])
+            elif kind == 'bulk':
+                self._redo_bulk(entry)
+            else:
+                self.set_layout_settings(*entry['new'])
+        finally:
+            self.history.redoing = False
+        return kind
+
+    def _redo_bulk(self, entry):
+        """
+        Insert the vertices again (they land as they did the first time up
+        to the first redraw), log and record the redraws without running
+        them, then put back the positions the bulk insertion ended with.
+        """
+        self.history.begin_group('bulk')
+        try:
+            for part in entry['entries']:
+                if part['kind'] == 'insert':
+                    self._insert_vertex(part['vp'], part['vq'], part['position'])
+                    continue
+                fields = {} if self.history.group.get('snapshot') else {
+                    'positions': (self.store.xs[:], self.store.ys[:])}
+                self._record(self._new_undo_entry('redraw', mode=part['mode'], **fields))
+                if self.log is not None:
+                    self.log.append_redraw(part['mode'])
+        finally:
+            self.history.end_group()
+        self.store.replace_positions(*entry['redrawn'])
+        self.store.restore_aggregates(entry['redrawn_aggregates'])
+
     def assign_vertex_color(self, vertex_id, color_number):
         """Assign a color from the palette (1-4) to a vertex."""
         if color_number in self.color_palette and vertex_id in self.vertices:
@@ -252,7 +628,8 @@ class Graph:
                 issues.append(f"Periphery vertex {v_id} does not exist")
         
         # Check if edges connect existing vertices
-        for v1_id, v2_id in self.edges:
+        edge_hi, edge_lo = self.adjacency.edge_arrays()
+        for v1_id, v2_id in zip(edge_lo, edge_hi):
             if v1_id not in self.vertices:
                 issues.append(f"Edge references non-existent vertex {v1_id}")
             if v2_id not in self.vertices:
@@ -278,43 +655,49 @@ class Graph:
         }
         
         if self.vertices:
-            # Calculate average degree
-            degrees = {}
-            for v1_id, v2_id in self.edges:
-                degrees[v1_id] = degrees.get(v1_id, 0) + 1
-                degrees[v2_id] = degrees.get(v2_id, 0) + 1
+            # Degrees are maintained by the adjacency store
+            degrees = [degree for _, degree in self.adjacency.degrees()]
             
             if degrees:
-                stats['avg_degree'] = sum(degrees.values()) / len(degrees)
-                stats['max_degree'] = max(degrees.values())
-                stats['min_degree'] = min(degrees.values())
+                stats['avg_degree'] = sum(degrees) / len(degrees)
+                stats['max_degree'] = max(degrees)
+                stats['min_degree'] = min(degrees)
         
         return stats
     
-    def generate_large_graph(self, target_vertices=1000):
+    def generate_large_graph(self, target_vertices=1000, rng=None, progress=None):
         """
         Generate a large graph for performance testing.
-        Efficiently creates many vertices by adding them systematically.
+        Efficiently creates many vertices by adding them systematically;
+        pass a seeded random.Random as `rng` for a reproducible graph.
+        `progress(vertices, target_vertices)` is called after every batch
+        (and during the periodic redraws).
         """
-        print(f"Generating large graph with {target_vertices} vertices...")
+        self._say(f"Generating large graph with {target_vertices} vertices...")
         
         # Start with basic triangle
         self.start_basic_graph()
         
-        # Add vertices in batches for better performance
-        batch_size = min(50, target_vertices // 20)
+        # Report (and redraw) in batches for better performance
+        batch_size = max(1, min(50, target_vertices // 20))
+
+        def report(done, total):
+            self._say(f"Generated {len(self.vertices)}/{target_vertices} vertices...")
+            if progress is not None:
+                progress(len(self.vertices), target_vertices)
+            # Periodic redraw for optimization (incremental layout
+            # schedules its own global passes)
+            if done % (batch_size * 4) == 0 and not self.incremental_layout:
+                self.redraw_graph(progress=redraw_progress if progress is not None else None)
+
+        def redraw_progress(done, total):
+            # Keep showing the insertion count while the layout runs
+            progress(len(self.vertices), target_vertices)
         
-        for i in range(4, target_vertices + 1):
-            if i % batch_size == 0:
-                print(f"Generated {i}/{target_vertices} vertices...")
-                # Periodic redraw for optimization
-                if i % (batch_size * 4) == 0:
-                    self.redraw_graph()
-            
-            # Add random vertex (more efficient than manual selection)
-            self.add_random_vertex()
+        self.add_vertices_bulk(count=max(0, target_vertices - len(self.vertices)), rng=rng,
+                               progress=report, progress_interval=batch_size)
         
-        print(f"Large graph generation complete! {len(self.vertices)} vertices, {len(self.edges)} edges.")
+        self._say(f"Large graph generation complete! {len(self.vertices)} vertices, {len(self.edges)} edges.")
         return self.get_graph_statistics()
     
     def optimize_for_large_graphs(self):
@@ -322,16 +705,13 @@ class Graph:
         if len(self.vertices) < 1000:
             return
         
-        print("Applying large graph optimizations...")
+        self._say("Applying large graph optimizations...")
         
         # Simplify vertex positions using clustering for distant vertices
         # This helps with rendering performance
-        vertex_positions = list(self.vertices.values())
-        
         # Group vertices by spatial proximity for better cache performance
         # This is a simplified spatial optimization
-        center_x = sum(v.pos[0] for v in vertex_positions) / len(vertex_positions)
-        center_y = sum(v.pos[1] for v in vertex_positions) / len(vertex_positions)
+        center_x, center_y = self.get_center()
         
         # Optimize vertex colors for large graphs (reduce color changes)
         for i, (v_id, vertex) in enumerate(self.vertices.items()):
@@ -352,4 +732,4 @@ class Graph:
             
             vertex.set_color(color_number)
         
-        print("Large graph optimizations applied.")
\ No newline at end of file
+        self._say("Large graph optimizations applied.")
\ No newline at end of file
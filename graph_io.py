@@ -0,0 +1,310 @@
+# graph_io.py - Streaming export/import of graphs as CSV, JSON Lines and GraphML
+#
+#   graph_io.save(graph, "out.graphml")          # format from the extension
+#   graph_io.load("out.csv", graph)              # replaces the graph's contents
+#   graph_io.write_jsonl(graph, sys.stdout)      # any text file-like object
+#
+# Writers pull vertices, edges, colors and the periphery order out of the
+# graph's arrays a chunk at a time and write each chunk as one string, so
+# memory stays flat however large the graph is.  Readers parse one row /
+# line / element at a time into compact typed arrays and build the graph
+# from those at the end (Graph.load_arrays), never holding the document.
+#
+# CSV rows (with a header line):
+#   vertex,<id>,<x>,<y>,<color number>,<#rrggbb custom color or empty>
+#   edge,<smaller id>,<larger id>
+#   periphery,<id>                      (clockwise order, one row per vertex)
+# JSON Lines: one object per line with the same fields, keyed by "type".
+# GraphML: nodes "n<id>" with x, y, color, rgb and periphery (ring position,
+# -1 off the ring) data; undirected edges.
+import csv
+import itertools
+import json
+import os
+from array import array
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+
+# Vertices / edges formatted per written chunk
+CHUNK_ROWS = 8192
+
+GRAPHML_NS = "http://graphml.graphdrawing.org/xmlns"
+
+
+def _hex(rgb):
+    return "#{:02x}{:02x}{:02x}".format(*rgb[:3])
+
+
+def _rgb(text):
+    text = text.lstrip('#')
+    return int(text[0:2], 16), int(text[2:4], 16), int(text[4:6], 16)
+
+
+def _ranges(count, size=CHUNK_ROWS):
+    for start in range(0, count, size):
+        yield start, min(count, start + size)
+
+
+def _vertex_chunks(graph):
+    """Lists of (id, x, y, color number, custom rgb or None) rows, CHUNK_ROWS at a time."""
+    store = graph.store
+    custom = store.custom_colors
+    for start, stop in _ranges(len(store)):
+        ids = range(start + 1, stop + 1)
+        yield list(zip(ids, store.xs[start + 1:stop + 1], store.ys[start + 1:stop + 1],
+                       store.color_numbers[start + 1:stop + 1], (custom.get(v_id) for v_id in ids)))
+
+
+def _edge_chunks(graph):
+    """Lists of (smaller id, larger id) edges, CHUNK_ROWS at a time."""
+    edge_hi, edge_lo = graph.adjacency.edge_arrays()
+    for start, stop in _ranges(len(edge_hi)):
+        yield list(zip(edge_lo[start:stop], edge_hi[start:stop]))
+
+
+def _periphery_chunks(graph):
+    """The periphery in clockwise order, CHUNK_ROWS ids at a time."""
+    ring = iter(graph.periphery)
+    while True:
+        ids = list(itertools.islice(ring, CHUNK_ROWS))
+        if not ids:
+            return
+        yield ids
+
+
+# --- Writers ---
+
+def iter_csv(graph):
+    """Yield the graph as CSV text chunks."""
+    yield "type,id,x,y,color,rgb\n"
+    for rows in _vertex_chunks(graph):
+        yield "".join(f"vertex,{v_id},{x!r},{y!r},{color},{_hex(rgb) if rgb else ''}\n"
+                      for v_id, x, y, color, rgb in rows)
+    for edges in _edge_chunks(graph):
+        yield "".join(f"edge,{lo},{hi}\n" for lo, hi in edges)
+    for ids in _periphery_chunks(graph):
+        yield "".join(f"periphery,{v_id}\n" for v_id in ids)
+
+
+def iter_jsonl(graph):
+    """Yield the graph as JSON Lines text chunks."""
+    for rows in _vertex_chunks(graph):
+        yield "".join(
+            f'{{"type":"vertex","id":{v_id},"x":{x!r},"y":{y!r},"color":{color}'
+            + (f',"rgb":"{_hex(rgb)}"}}\n' if rgb else '}\n')
+            for v_id, x, y, color, rgb in rows)
+    for edges in _edge_chunks(graph):
+        yield "".join(f'{{"type":"edge","source":{lo},"target":{hi}}}\n' for lo, hi in edges)
+    for ids in _periphery_chunks(graph):
+        yield "".join(f'{{"type":"periphery","id":{v_id}}}\n' for v_id in ids)
+
+
+def iter_graphml(graph):
+    """Yield the graph as GraphML text chunks."""
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           f'<graphml xmlns="{GRAPHML_NS}">\n'
+           '  <key id="x" for="node" attr.name="x" attr.type="double"/>\n'
+           '  <key id="y" for="node" attr.name="y" attr.type="double"/>\n'
+           '  <key id="color" for="node" attr.name="color" attr.type="int"/>\n'
+           '  <key id="rgb" for="node" attr.name="rgb" attr.type="string"/>\n'
+           '  <key id="periphery" for="node" attr.name="periphery" attr.type="int">'
+           '<default>-1</default></key>\n'
+           '  <graph id="G" edgedefault="undirected">\n')
+    ring = {v_id: i for i, v_id in enumerate(graph.periphery)}
+    for rows in _vertex_chunks(graph):
+        yield "".join(
+            f'    <node id="n{v_id}"><data key="x">{x!r}</data><data key="y">{y!r}</data>'
+            f'<data key="color">{color}</data>'
+            + (f'<data key="rgb">{_hex(rgb)}</data>' if rgb else '')
+            + (f'<data key="periphery">{ring[v_id]}</data>' if v_id in ring else '')
+            + '</node>\n'
+            for v_id, x, y, color, rgb in rows)
+    for edges in _edge_chunks(graph):
+        yield "".join(f'    <edge source="n{lo}" target="n{hi}"/>\n' for lo, hi in edges)
+    yield '  </graph>\n</graphml>\n'
+
+
+def _write(chunks, f):
+    for chunk in chunks:
+        f.write(chunk)
+
+
+def write_csv(graph, f):
+    _write(iter_csv(graph), f)
+
+
+def write_jsonl(graph, f):
+    _write(iter_jsonl(graph), f)
+
+
+def write_graphml(graph, f):
+    _write(iter_graphml(graph), f)
+
+
+# --- Readers ---
+
+class _GraphBuilder:
+    """Collects streamed vertices, edges and periphery into typed arrays."""
+    def __init__(self):
+        self.xs = array('d', [0.0])
+        self.ys = array('d', [0.0])
+        self.colors = array('b', [0])
+        self.custom_colors = {}
+        self.edge_hi = array('i')
+        self.edge_lo = array('i')
+        self.periphery = []
+        self.vertex_count = 0
+
+    def vertex(self, v_id, x, y, color=1, rgb=None):
+        if v_id < 1:
+            raise ValueError(f"Invalid vertex id {v_id}")
+        if v_id >= len(self.xs):
+            missing = v_id + 1 - len(self.xs)
+            self.xs.extend([float('nan')] * missing)
+            self.ys.extend([float('nan')] * missing)
+            self.colors.extend([0] * missing)
+        elif self.colors[v_id]:
+            raise ValueError(f"Duplicate vertex {v_id}")
+        self.xs[v_id] = x
+        self.ys[v_id] = y
+        self.colors[v_id] = max(1, min(4, color))
+        if rgb:
+            self.custom_colors[v_id] = rgb
+        self.vertex_count += 1
+
+    def edge(self, u, v):
+        if u == v:
+            raise ValueError(f"Self-loop on vertex {u}")
+        self.edge_hi.append(max(u, v))
+        self.edge_lo.append(min(u, v))
+
+    def build(self, graph):
+        count = len(self.xs) - 1
+        if self.vertex_count != count:
+            raise ValueError(f"Vertex ids must be 1..{count} without gaps")
+        hi = np.frombuffer(self.edge_hi, dtype=np.intc)
+        lo = np.frombuffer(self.edge_lo, dtype=np.intc)
+        if len(hi) and (hi.max() > count or lo.min() < 1):
+            raise ValueError("Edge endpoint is not a vertex")
+        graph.load_arrays(self.xs, self.ys, hi, lo, self.periphery, self.colors, self.custom_colors)
+        return graph
+
+
+def read_csv(f, graph):
+    """Replace the contents of `graph` with CSV written by write_csv."""
+    builder = _GraphBuilder()
+    reader = csv.reader(f)
+    next(reader, None)
+    for row in reader:
+        if not row:
+            continue
+        kind = row[0]
+        if kind == 'vertex':
+            builder.vertex(int(row[1]), float(row[2]), float(row[3]), int(row[4] or 1),
+                           _rgb(row[5]) if len(row) > 5 and row[5] else None)
+        elif kind == 'edge':
+            builder.edge(int(row[1]), int(row[2]))
+        elif kind == 'periphery':
+            builder.periphery.append(int(row[1]))
+        else:
+            raise ValueError(f"Unknown row type '{kind}' at line {reader.line_num}")
+    return builder.build(graph)
+
+
+def read_jsonl(f, graph):
+    """Replace the contents of `graph` with JSON Lines written by write_jsonl."""
+    builder = _GraphBuilder()
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        kind = item.get('type')
+        if kind == 'vertex':
+            builder.vertex(int(item['id']), float(item['x']), float(item['y']), int(item.get('color', 1)),
+                           _rgb(item['rgb']) if item.get('rgb') else None)
+        elif kind == 'edge':
+            builder.edge(int(item['source']), int(item['target']))
+        elif kind == 'periphery':
+            builder.periphery.append(int(item['id']))
+        else:
+            raise ValueError(f"Unknown record type '{kind}' at line {line_number}")
+    return builder.build(graph)
+
+
+def _node_id(text):
+    return int(text[1:] if text.startswith('n') else text)
+
+
+def read_graphml(f, graph):
+    """
+    Replace the contents of `graph` with GraphML written by write_graphml
+    (`f` may be a binary file or a path). Elements are discarded as soon as
+    they are read.
+    """
+    builder = _GraphBuilder()
+    graph_tag, node_tag, edge_tag, data_tag, key_tag = (
+        f"{{{GRAPHML_NS}}}{name}" for name in ('graph', 'node', 'edge', 'data', 'key'))
+    keys = {}
+    ring = []
+    parent = None
+    for event, element in iterparse(f, events=('start', 'end')):
+        tag = element.tag
+        if event == 'start':
+            if tag == graph_tag:
+                parent = element
+            continue
+        if tag == node_tag:
+            values = {keys.get(data.get('key'), data.get('key')): data.text
+                      for data in element.iter(data_tag)}
+            v_id = _node_id(element.get('id'))
+            builder.vertex(v_id, float(values['x']), float(values['y']), int(values.get('color') or 1),
+                           _rgb(values['rgb']) if values.get('rgb') else None)
+            position = int(values.get('periphery') or -1)
+            if position >= 0:
+                ring.append((position, v_id))
+        elif tag == edge_tag:
+            builder.edge(_node_id(element.get('source')), _node_id(element.get('target')))
+        elif tag == key_tag:
+            keys[element.get('id')] = element.get('attr.name')
+            continue
+        else:
+            continue
+        # Drop the nodes and edges read so far
+        parent.clear()
+    ring.sort()
+    builder.periphery = [v_id for _, v_id in ring]
+    return builder.build(graph)
+
+
+# --- By file name ---
+
+FORMATS = {
+    '.csv': (write_csv, read_csv),
+    '.jsonl': (write_jsonl, read_jsonl),
+    '.graphml': (write_graphml, read_graphml),
+}
+
+
+def _format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unknown graph file format '{extension}' (use {', '.join(FORMATS)})")
+    return FORMATS[extension]
+
+
+def save(graph, path):
+    """Write `graph` to `path` in the format given by its extension."""
+    writer, _ = _format(path)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer(graph, f)
+
+
+def load(path, graph):
+    """Replace the contents of `graph` with `path`, in the format given by its extension."""
+    _, reader = _format(path)
+    if reader is read_graphml:
+        with open(path, 'rb') as f:
+            return reader(f, graph)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return reader(f, graph)
@@ -0,0 +1,65 @@
+# label_cache.py
+from collections import OrderedDict
+import pygame
+
+# Labels smaller than this (in points, before clamping) are not legible and
+# are skipped altogether
+MIN_LABEL_SIZE = 8
+
+
+class LabelCache:
+    """
+    Fonts by size and pre-rendered vertex labels by (vertex id, size).
+
+    A label is rendered once as a single surface with its black outline
+    already composited, so drawing it costs one blit.  Labels are kept in
+    least-recently-used order and evicted once their pixel memory exceeds
+    `max_bytes`.
+    """
+    def __init__(self, font_name='Arial', max_bytes=32 * 1024 * 1024):
+        self.font_name = font_name
+        self.max_bytes = max_bytes
+        self._fonts = {}
+        self._labels = OrderedDict()
+        self._bytes = 0
+
+    def font(self, size):
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = pygame.font.SysFont(self.font_name, size, bold=True)
+        return font
+
+    def get(self, v_id, size):
+        """Outlined label surface for a vertex id at a font size."""
+        key = (v_id, size)
+        label = self._labels.get(key)
+        if label is not None:
+            self._labels.move_to_end(key)
+            return label
+
+        label = self._render(str(v_id), size)
+        self._labels[key] = label
+        self._bytes += label.get_width() * label.get_height() * label.get_bytesize()
+        while self._bytes > self.max_bytes and len(self._labels) > 1:
+            _, evicted = self._labels.popitem(last=False)
+            self._bytes -= evicted.get_width() * evicted.get_height() * evicted.get_bytesize()
+        return label
+
+    def _render(self, text, size):
+        # White text over a 1px black outline on the diagonals, on a
+        # transparent surface padded by the outline width
+        font = self.font(size)
+        text_surf = font.render(text, True, (255, 255, 255))
+        outline = font.render(text, True, (0, 0, 0))
+        label = pygame.Surface((text_surf.get_width() + 2, text_surf.get_height() + 2), pygame.SRCALPHA)
+        for dx, dy in [(0, 0), (0, 2), (2, 0), (2, 2)]:
+            label.blit(outline, (dx, dy))
+        label.blit(text_surf, (1, 1))
+        return label
+
+    def clear(self):
+        self._labels.clear()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._labels)
@@ -0,0 +1,494 @@
+# layout.py
+# Array-based layout engine used by Graph.redraw_graph. Positions are handled
+# as NumPy arrays indexed by vertex id (slot 0 unused, matching VertexStore),
+# so every pass is a batched array operation instead of a Python loop.
+import math
+import numpy as np
+
+# Upper bound on the number of pair entries materialized at once by the
+# all-pairs repulsion (rows per chunk * interior vertices); small enough for
+# the temporaries to stay cache resident.
+REPULSION_CHUNK_ELEMENTS = 1 << 17
+
+# Largest distance a vertex moves in one force iteration, in ideal edge
+# lengths.  Nearly coincident vertices repel with nearly unbounded force;
+# uncapped, one step flings them out by ~1e29 and the layout never recovers
+# (and a quadtree over it degenerates to its maximum depth).
+MAX_STEP_LENGTHS = 1.0
+
+# Layout modes understood by Graph.redraw_graph:
+#   force      - exact all-pairs repulsion, O(n^2) per iteration
+#   barnes_hut - quadtree-approximated repulsion, O(n log n) per iteration
+#   tutte      - barycentric (Tutte) embedding solved directly; crossing-free
+#                for triangulations with the periphery pinned to a circle
+LAYOUT_MODES = ("force", "barnes_hut", "tutte")
+
+
+def store_positions(store):
+    """Copy the store's coordinates into fresh float64 arrays (xs, ys)."""
+    xs = np.frombuffer(store.xs, dtype=np.float64).copy()
+    ys = np.frombuffer(store.ys, dtype=np.float64).copy()
+    return xs, ys
+
+
+def edge_arrays(adjacency):
+    """Copy the adjacency's flat edge arrays into int64 arrays (hi, lo)."""
+    edge_hi, edge_lo = adjacency.edge_arrays()
+    hi = np.frombuffer(edge_hi, dtype=np.intc).astype(np.int64)
+    lo = np.frombuffer(edge_lo, dtype=np.intc).astype(np.int64)
+    return hi, lo
+
+
+def average_edge_length(xs, ys, edge_hi, edge_lo):
+    """Mean Euclidean edge length, or None for an edgeless graph."""
+    if len(edge_hi) == 0:
+        return None
+    lengths = np.hypot(xs[edge_hi] - xs[edge_lo], ys[edge_hi] - ys[edge_lo])
+    return float(lengths.mean())
+
+
+def place_on_circle(xs, ys, ring_ids, center, radius):
+    """Spread the given vertices evenly (in order) around a circle."""
+    count = len(ring_ids)
+    if count == 0:
+        return
+    angles = 2 * math.pi * np.arange(count) / count
+    xs[ring_ids] = center[0] + radius * np.cos(angles)
+    ys[ring_ids] = center[1] + radius * np.sin(angles)
+
+
+def _repulsion(px, py, ideal_length, chunk_rows):
+    """
+    All-pairs inverse-square repulsion among the given points.  Rows are
+    processed in chunks against the columns from the chunk onwards only; each
+    pair's force is added to its row and subtracted from its column, so every
+    pair is evaluated once (as in the original triangular loop).
+    """
+    count = len(px)
+    fx = np.zeros(count)
+    fy = np.zeros(count)
+    k2 = ideal_length * ideal_length
+    for start in range(0, count, chunk_rows):
+        stop = min(start + chunk_rows, count)
+        dx = px[start:stop, None] - px[None, start:]
+        dy = py[start:stop, None] - py[None, start:]
+        # Force magnitude k^2 / d^2 along the unit vector (dx / d): k^2 / d^3
+        scale = dx * dx
+        dist_cubed = dy * dy
+        scale += dist_cubed
+        np.sqrt(scale, out=dist_cubed)
+        dist_cubed *= scale
+        with np.errstate(divide='ignore', over='ignore'):
+            np.divide(k2, dist_cubed, out=scale)
+        # Coincident points (including each point with itself) contribute 0
+        scale[dist_cubed == 0] = 0
+        dx *= scale
+        dy *= scale
+        fx[start:stop] += dx.sum(axis=1)
+        fy[start:stop] += dy.sum(axis=1)
+        # Columns past the diagonal block receive the opposite force
+        block = stop - start
+        fx[stop:] -= dx[:, block:].sum(axis=0)
+        fy[stop:] -= dy[:, block:].sum(axis=0)
+    return fx, fy
+
+
+def _ramp(counts):
+    """Concatenated aranges: [0..counts[0]), [0..counts[1]), ..."""
+    total = int(counts.sum())
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(total) - offsets
+
+
+class QuadTree:
+    """
+    Adaptive quadtree over a point set, built level by level with array ops.
+
+    Each node splits its points into four quadrants around the center of its
+    own bounding box, so the tree adapts to clusters and far outliers alike
+    (a fixed global grid degenerates when the force layout flings a few
+    vertices very far away).  Points are kept sorted so that every node, at
+    every level, owns a contiguous range [start, start + count) of the final
+    order.  Each level stores node ranges, masses, centers of mass, bounding
+    box sizes and the range of each node's children in the next level.
+    Nodes still holding more than `leaf_size` distinct points when
+    `max_depth` is reached are flagged `bulk`.
+    """
+    def __init__(self, px, py, leaf_size=16, max_depth=64):
+        count = len(px)
+        order = np.arange(count)
+        sx, sy = px, py
+        node_of = np.zeros(count, dtype=np.int64)
+
+        self.levels = []
+        for depth in range(max_depth + 1):
+            starts = np.flatnonzero(np.r_[True, node_of[1:] != node_of[:-1]])
+            counts = np.diff(np.r_[starts, count])
+            min_x = np.minimum.reduceat(sx, starts)
+            max_x = np.maximum.reduceat(sx, starts)
+            min_y = np.minimum.reduceat(sy, starts)
+            max_y = np.maximum.reduceat(sy, starts)
+            size = np.maximum(max_x - min_x, max_y - min_y)
+            # Small nodes and nodes of coincident points are not split further
+            leaf = (counts <= leaf_size) | ~(size > 0)
+            bulk = np.zeros(len(starts), dtype=bool)
+            if depth == max_depth:
+                bulk = ~leaf
+                leaf[:] = True
+            self.levels.append({
+                'start': starts,
+                'count': counts,
+                'size': size,
+                'leaf': leaf,
+                'bulk': bulk,
+                'com_x': np.add.reduceat(sx, starts) / counts,
+                'com_y': np.add.reduceat(sy, starts) / counts,
+            })
+            if leaf.all():
+                break
+
+            # Regroup every splittable node's points by quadrant; the sort is
+            # stable and keyed by node first, so node ranges stay in place.
+            segment = np.repeat(np.arange(len(starts)), counts)
+            mid_x = ((min_x + max_x) / 2)[segment]
+            mid_y = ((min_y + max_y) / 2)[segment]
+            quadrant = (sx > mid_x).astype(np.int64) + 2 * (sy > mid_y)
+            quadrant[leaf[segment]] = 0
+            keys = segment * 4 + quadrant
+            perm = np.argsort(keys, kind='stable')
+            order, sx, sy, node_of = order[perm], sx[perm], sy[perm], keys[perm]
+
+        for parent, child in zip(self.levels, self.levels[1:]):
+            parent['child_lo'] = np.searchsorted(child['start'], parent['start'])
+            parent['child_hi'] = np.searchsorted(child['start'], parent['start'] + parent['count'])
+        self.order = order
+        self.sx = sx
+        self.sy = sy
+
+
+def _barnes_hut_repulsion(px, py, ideal_length, theta, leaf_size=16, batch_size=2048,
+                          direct_budget=1 << 20):
+    """
+    Approximate the all-pairs repulsion with the Barnes-Hut opening-angle
+    criterion.  The tree is walked level-synchronously for a batch of points
+    at a time: each (point, node) pair is either accepted (node size / d <
+    theta, node not containing the point) and treated as one pseudo-particle
+    at its center of mass, resolved exactly against the node's points when
+    the node is a leaf, or opened into its children at the next level.
+    Leaves cut off at the maximum depth (see QuadTree) are always taken as
+    one body, without the point itself if it is inside, so their cost does
+    not grow with their size.
+    """
+    tree = QuadTree(px, py, leaf_size)
+    count = len(px)
+    k2 = ideal_length * ideal_length
+    fx_sorted = np.zeros(count)
+    fy_sorted = np.zeros(count)
+
+    def add_forces(points, dx, dy, mass, local_fx, local_fy, offset, size):
+        dist_sq = dx * dx + dy * dy
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            scale = np.where(dist_sq > 0, mass * k2 / (dist_sq * np.sqrt(dist_sq)), 0.0)
+        local_fx += np.bincount(points - offset, weights=scale * dx, minlength=size)
+        local_fy += np.bincount(points - offset, weights=scale * dy, minlength=size)
+
+    for start in range(0, count, batch_size):
+        stop = min(start + batch_size, count)
+        size = stop - start
+        local_fx = np.zeros(size)
+        local_fy = np.zeros(size)
+        points = np.arange(start, stop)
+        nodes = np.zeros(size, dtype=np.int64)
+
+        for level in tree.levels:
+            node_start = level['start'][nodes]
+            node_counts = level['count'][nodes]
+            dx = tree.sx[points] - level['com_x'][nodes]
+            dy = tree.sy[points] - level['com_y'][nodes]
+            node_size = level['size'][nodes]
+            contains = (points >= node_start) & (points < node_start + node_counts)
+            accept = ~contains & (node_size * node_size < theta * theta * (dx * dx + dy * dy))
+            if accept.any():
+                add_forces(points[accept], dx[accept], dy[accept], node_counts[accept],
+                           local_fx, local_fy, start, size)
+
+            remaining = ~accept
+            bulk = remaining & level['bulk'][nodes]
+            if bulk.any():
+                bulk_points = points[bulk]
+                mass = node_counts[bulk].astype(np.float64)
+                # Center of mass of the other points of the node
+                inside = contains[bulk]
+                moment_x = level['com_x'][nodes[bulk]] * mass
+                moment_y = level['com_y'][nodes[bulk]] * mass
+                moment_x[inside] -= tree.sx[bulk_points[inside]]
+                moment_y[inside] -= tree.sy[bulk_points[inside]]
+                mass[inside] -= 1
+                add_forces(bulk_points, tree.sx[bulk_points] - moment_x / mass,
+                           tree.sy[bulk_points] - moment_y / mass, mass,
+                           local_fx, local_fy, start, size)
+                remaining &= ~bulk
+            leaf = remaining & level['leaf'][nodes]
+            if leaf.any():
+                # Resolve leaves exactly against each of their points, in
+                # slices so huge leaves cannot exhaust memory
+                leaf_points = points[leaf]
+                leaf_starts = node_start[leaf]
+                leaf_counts = node_counts[leaf]
+                totals = np.cumsum(leaf_counts)
+                lo = 0
+                while lo < len(leaf_counts):
+                    base = totals[lo - 1] if lo else 0
+                    hi = max(lo + 1, int(np.searchsorted(totals, base + direct_budget, side='right')))
+                    counts = leaf_counts[lo:hi]
+                    sources = np.repeat(leaf_starts[lo:hi], counts) + _ramp(counts)
+                    targets = np.repeat(leaf_points[lo:hi], counts)
+                    add_forces(targets, tree.sx[targets] - tree.sx[sources],
+                               tree.sy[targets] - tree.sy[sources], 1.0,
+                               local_fx, local_fy, start, size)
+                    lo = hi
+
+            opened = remaining & ~leaf
+            if not opened.any():
+                break
+            child_lo = level['child_lo'][nodes[opened]]
+            child_counts = level['child_hi'][nodes[opened]] - child_lo
+            points = np.repeat(points[opened], child_counts)
+            nodes = np.repeat(child_lo, child_counts) + _ramp(child_counts)
+
+        fx_sorted[start:stop] = local_fx
+        fy_sorted[start:stop] = local_fy
+
+    fx = np.empty(count)
+    fy = np.empty(count)
+    fx[tree.order] = fx_sorted
+    fy[tree.order] = fy_sorted
+    return fx, fy
+
+
+def _attraction(xs, ys, edge_a, edge_b, ideal_length, size):
+    """Spring forces (d - L) * 0.1 along the given edges, summed per vertex."""
+    dx = xs[edge_b] - xs[edge_a]
+    dy = ys[edge_b] - ys[edge_a]
+    dist = np.hypot(dx, dy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(dist > 0, (dist - ideal_length) * 0.1 / dist, 0.0)
+    force_x = scale * dx
+    force_y = scale * dy
+    fx = (np.bincount(edge_a, weights=force_x, minlength=size)
+          - np.bincount(edge_b, weights=force_x, minlength=size))
+    fy = (np.bincount(edge_a, weights=force_y, minlength=size)
+          - np.bincount(edge_b, weights=force_y, minlength=size))
+    return fx, fy
+
+
+def force_directed(xs, ys, movable_ids, edge_hi, edge_lo, ideal_length,
+                   iterations=50, damping=0.1, theta=None, progress=None):
+    """
+    Relax the movable vertices in place with the classic redraw forces:
+    inverse-square repulsion between every pair of movable vertices and a
+    spring along every edge whose endpoints are both movable.  All forces of
+    an iteration are computed from the same positions, then applied together.
+
+    With `theta` set, repulsion is approximated with a Barnes-Hut quadtree
+    rebuilt every iteration (O(n log n)); smaller theta is more accurate.
+    No vertex moves more than MAX_STEP_LENGTHS ideal lengths per iteration.
+    `progress(done, iterations)` is called after every iteration.
+    """
+    size = len(xs)
+    if len(movable_ids) == 0:
+        return
+    movable = np.zeros(size, dtype=bool)
+    movable[movable_ids] = True
+    keep = movable[edge_hi] & movable[edge_lo]
+    edge_a, edge_b = edge_lo[keep], edge_hi[keep]
+    chunk_rows = max(1, REPULSION_CHUNK_ELEMENTS // len(movable_ids))
+    max_step = MAX_STEP_LENGTHS * ideal_length
+
+    for iteration in range(iterations):
+        if theta:
+            rep_x, rep_y = _barnes_hut_repulsion(xs[movable_ids], ys[movable_ids],
+                                                 ideal_length, theta)
+        else:
+            rep_x, rep_y = _repulsion(xs[movable_ids], ys[movable_ids], ideal_length, chunk_rows)
+        att_x, att_y = _attraction(xs, ys, edge_a, edge_b, ideal_length, size)
+        step_x = (rep_x + att_x[movable_ids]) * damping
+        step_y = (rep_y + att_y[movable_ids]) * damping
+        step = np.hypot(step_x, step_y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            limit = np.where(step > max_step, max_step / step, 1.0)
+        xs[movable_ids] += step_x * limit
+        ys[movable_ids] += step_y * limit
+        if progress is not None:
+            progress(iteration + 1, iterations)
+
+
+class Multigrid:
+    """
+    Aggregation multigrid hierarchy for a symmetric system
+        diagonal(v) * p(v) - sum(weight(e) * p(u) over edges e = (u, v)),
+    used as a conjugate gradient preconditioner.  Each level groups every
+    vertex with a neighboring root (roots are local maxima of a fixed
+    pseudo-random priority, so the hierarchy is deterministic) and sums the
+    system over each group to form the next, coarser level.  The coarsest
+    level is inverted densely once it is down to `coarsest` unknowns; if
+    aggregation stalls before that (e.g. vertices with no neighbors left in
+    the system), it is only Jacobi-smoothed.  Matrices are kept as (diagonal, edge_a, edge_b,
+    weight) arrays, like the edge arrays of the graph itself.
+    """
+    def __init__(self, diagonal, edge_a, edge_b, coarsest=400, smoothing=0.6):
+        self.smoothing = smoothing
+        weight = np.ones(len(edge_a))
+        rng = np.random.default_rng(0)
+        self.levels = []
+        while True:
+            count = len(diagonal)
+            level = {'diagonal': diagonal, 'a': edge_a, 'b': edge_b, 'weight': weight}
+            self.levels.append(level)
+            if count <= coarsest:
+                break
+            group, groups = self._aggregate(count, edge_a, edge_b, rng.random(count))
+            if groups > 0.8 * count:
+                break
+            level['group'] = group
+            group_a, group_b = group[edge_a], group[edge_b]
+            inside = group_a == group_b
+            diagonal = (np.bincount(group, weights=diagonal, minlength=groups)
+                        - 2 * np.bincount(group_a[inside], weights=weight[inside], minlength=groups))
+            # Edges between the same two groups merge into one
+            lo = np.minimum(group_a, group_b)[~inside]
+            hi = np.maximum(group_a, group_b)[~inside]
+            keys, merged = np.unique(hi * groups + lo, return_inverse=True)
+            weight = np.bincount(merged, weights=weight[~inside])
+            edge_a, edge_b = keys // groups, keys % groups
+        if count <= coarsest:
+            dense = np.diag(level['diagonal'])
+            np.subtract.at(dense, (level['a'], level['b']), level['weight'])
+            np.subtract.at(dense, (level['b'], level['a']), level['weight'])
+            level['inverse'] = np.linalg.pinv(dense)
+
+    @staticmethod
+    def _aggregate(count, edge_a, edge_b, priority):
+        """Group ids for `count` vertices and the number of groups."""
+        group = np.full(count, -1, dtype=np.int64)
+        groups = 0
+        while True:
+            free = group < 0
+            if not free.any():
+                return group, groups
+            # Free vertices outranking all their free neighbors become roots
+            both = free[edge_a] & free[edge_b]
+            best = np.full(count, -1.0)
+            np.maximum.at(best, edge_a[both], priority[edge_b[both]])
+            np.maximum.at(best, edge_b[both], priority[edge_a[both]])
+            roots = np.flatnonzero(free & (priority > best))
+            group[roots] = np.arange(groups, groups + len(roots))
+            groups += len(roots)
+            is_root = np.zeros(count, dtype=bool)
+            is_root[roots] = True
+            # Their free neighbors join them
+            for root, other in ((edge_a, edge_b), (edge_b, edge_a)):
+                joining = is_root[root] & (group[other] < 0)
+                group[other[joining]] = group[root[joining]]
+
+    def apply(self, vectors, depth=0):
+        """The level's matrix times `vectors` (one column per coordinate)."""
+        level = self.levels[depth]
+        a, b, weight = level['a'], level['b'], level['weight']
+        count = len(level['diagonal'])
+        result = vectors * level['diagonal'][:, None]
+        for axis in range(vectors.shape[1]):
+            column = vectors[:, axis]
+            result[:, axis] -= (np.bincount(a, weights=weight * column[b], minlength=count)
+                                + np.bincount(b, weights=weight * column[a], minlength=count))
+        return result
+
+    def cycle(self, residual, depth=0):
+        """
+        One V-cycle from a zero guess: damped Jacobi smoothing before and
+        after the coarse correction, so the preconditioner stays symmetric.
+        """
+        level = self.levels[depth]
+        if depth == len(self.levels) - 1:
+            if 'inverse' in level:
+                return level['inverse'] @ residual
+            return residual / level['diagonal'][:, None]
+        scale = self.smoothing / level['diagonal'][:, None]
+        group = level['group']
+        groups = len(self.levels[depth + 1]['diagonal'])
+        correction = scale * residual
+        remaining = residual - self.apply(correction, depth)
+        coarse = np.column_stack([np.bincount(group, weights=remaining[:, axis], minlength=groups)
+                                  for axis in range(residual.shape[1])])
+        correction += self.cycle(coarse, depth + 1)[group]
+        correction += scale * (residual - self.apply(correction, depth))
+        return correction
+
+
+def tutte_embedding(xs, ys, interior_ids, edge_hi, edge_lo, tolerance=1e-6,
+                    max_iterations=1000, progress=None):
+    """
+    Move every interior vertex to the barycenter of its neighbors, with all
+    other vertices held fixed, by solving the sparse linear system
+        degree(v) * p(v) - sum(interior neighbors p) = sum(fixed neighbors p)
+    with multigrid-preconditioned conjugate gradient.  The matrix is never
+    formed: products are accumulated over the edge arrays with bincount.
+    The current positions are the starting guess, so re-solving after a few
+    insertions converges in a handful of iterations.
+
+    Updates xs/ys in place and returns (iterations used, converged);
+    `progress(iterations, max_iterations)` is called after every iteration.
+    """
+    count = len(interior_ids)
+    if count == 0:
+        return 0, True
+    size = len(xs)
+    local = np.full(size, -1, dtype=np.int64)
+    local[interior_ids] = np.arange(count)
+    a = local[edge_hi]
+    b = local[edge_lo]
+    degree = (np.bincount(edge_hi, minlength=size) + np.bincount(edge_lo, minlength=size))[interior_ids]
+    degree = np.maximum(degree, 1).astype(np.float64)
+
+    both = (a >= 0) & (b >= 0)
+    multigrid = Multigrid(degree, a[both], b[both])
+    # Fixed neighbors move to the right-hand side
+    hi_only = (a >= 0) & (b < 0)
+    lo_only = (b >= 0) & (a < 0)
+    rhs = np.empty((count, 2))
+    for axis, coords in enumerate((xs, ys)):
+        rhs[:, axis] = (np.bincount(a[hi_only], weights=coords[edge_lo[hi_only]], minlength=count)
+                        + np.bincount(b[lo_only], weights=coords[edge_hi[lo_only]], minlength=count))
+
+    # Both coordinates are solved together, one CG recurrence per column
+    solution = np.column_stack((xs[interior_ids], ys[interior_ids]))
+    residual = rhs - multigrid.apply(solution)
+    goal = tolerance * np.maximum(np.linalg.norm(rhs, axis=0), 1.0)
+    preconditioned = multigrid.cycle(residual)
+    direction = preconditioned.copy()
+    rz = (residual * preconditioned).sum(axis=0)
+
+    iterations = 0
+    while True:
+        converged = bool((np.linalg.norm(residual, axis=0) <= goal).all())
+        if converged or iterations == max_iterations:
+            break
+        product = multigrid.apply(direction)
+        curvature = (direction * product).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            alpha = np.where(curvature > 0, rz / curvature, 0.0)
+        solution += alpha * direction
+        residual -= alpha * product
+        preconditioned = multigrid.cycle(residual)
+        rz_next = (residual * preconditioned).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta = np.where(rz > 0, rz_next / rz, 0.0)
+        direction = preconditioned + beta * direction
+        rz = rz_next
+        iterations += 1
+        if progress is not None:
+            progress(iterations, max_iterations)
+
+    xs[interior_ids] = solution[:, 0]
+    ys[interior_ids] = solution[:, 1]
+    return iterations, converged
@@ -0,0 +1,246 @@
+# lod.py - Level-of-detail rasterization for zoomed-out graphs
+#
+# Once vertices shrink to a few pixels, issuing one pygame draw call per
+# vertex and per edge costs far more than the pixels it produces.  These
+# functions write straight into a surface's pixel buffer with NumPy instead:
+# edges are sampled once per pixel along their (clipped) length and
+# accumulated into a per-pixel count that is tone-mapped into a density
+# image, and vertices are splatted as small discs in their palette color.
+import numpy as np
+import pygame
+
+from vertex import COLOR_PALETTE
+
+# Vertices whose on-screen radius is below this many pixels are splatted
+LOD_VECTOR_RADIUS = 4
+# More visible vertices (edges) than this are splatted even when large
+# enough to see
+LOD_MAX_VECTOR_VERTICES = 20000
+LOD_MAX_VECTOR_EDGES = 20000
+# Edge samples per frame; past this, long edges are sampled every few pixels
+LOD_MAX_SAMPLES = 4000000
+# Edge samples per pixel above which the density image is fully saturated
+LOD_SATURATION = 16
+# Brightness of a pixel crossed by a single edge, as a fraction of the edge color
+LOD_MIN_INTENSITY = 0.35
+
+_PALETTE = np.array([(0, 0, 0)] + [COLOR_PALETTE[n] for n in sorted(COLOR_PALETTE)], dtype=np.int16)
+
+
+def _clip_segments(x0, y0, x1, y1, left, top, right, bottom):
+    """
+    Clip segments to a rectangle. Segments entirely inside are kept as they
+    are and those entirely to one side are dropped; only the few crossing
+    the border go through (vectorized) Liang-Barsky clipping.  Also returns
+    the index of each kept segment (inside ones first, then clipped ones).
+    """
+    x_lo, x_hi = np.minimum(x0, x1), np.maximum(x0, x1)
+    y_lo, y_hi = np.minimum(y0, y1), np.maximum(y0, y1)
+    inside = (x_lo >= left) & (x_hi <= right) & (y_lo >= top) & (y_hi <= bottom)
+    crossing = ~inside & (x_hi >= left) & (x_lo <= right) & (y_hi >= top) & (y_lo <= bottom)
+
+    cx0, cy0, cx1, cy1 = x0[crossing], y0[crossing], x1[crossing], y1[crossing]
+    dx, dy = cx1 - cx0, cy1 - cy0
+    t0 = np.zeros_like(cx0)
+    t1 = np.ones_like(cx0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in ((-dx, cx0 - left), (dx, right - cx0), (-dy, cy0 - top), (dy, bottom - cy0)):
+            t = q / p
+            t0 = np.where(p < 0, np.maximum(t0, t), t0)
+            t1 = np.where(p > 0, np.minimum(t1, t), t1)
+    hits = t0 <= t1
+    t0, t1 = t0[hits], t1[hits]
+    cx0, cy0, dx, dy = cx0[hits], cy0[hits], dx[hits], dy[hits]
+    index = np.concatenate((np.flatnonzero(inside), np.flatnonzero(crossing)[hits]))
+    return (np.concatenate((x0[inside], cx0 + t0 * dx)), np.concatenate((y0[inside], cy0 + t0 * dy)),
+            np.concatenate((x1[inside], cx0 + t1 * dx)), np.concatenate((y1[inside], cy0 + t1 * dy)),
+            index)
+
+
+def _edge_samples(region, sx0, sy0, sx1, sy1, in_order=False):
+    """
+    Pixel samples of screen-space segments inside `region`, as flat
+    (x * height + y) indices grouped by segment.  Returns (samples, owners,
+    stride): the index of the segment each sample belongs to (ascending if
+    `in_order`) and the sampling stride, or None if nothing is visible.
+    """
+    left, top = region.left, region.top
+    width, height = region.width, region.height
+    if not len(sx0) or width <= 0 or height <= 0:
+        return None
+    x0, y0, x1, y1, index = _clip_segments(sx0, sy0, sx1, sy1,
+                                           left, top, region.right - 1, region.bottom - 1)
+    if not len(x0):
+        return None
+    if in_order:
+        order = np.argsort(index, kind='stable')
+        x0, y0, x1, y1, index = x0[order], y0[order], x1[order], y1[order], index[order]
+    dx, dy = x1 - x0, y1 - y0
+
+    # One sample per pixel along the longer axis of each segment, or every
+    # `stride` pixels (each sample weighted by the stride) over budget
+    lengths = np.maximum(np.abs(dx), np.abs(dy))
+    stride = max(1, int(np.ceil(lengths.sum() / LOD_MAX_SAMPLES)))
+    counts = (np.ceil(lengths / stride) + 1).astype(np.int64)
+    owner = np.repeat(np.arange(len(counts)), counts)
+    step = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    t = step / np.maximum(counts - 1, 1)[owner]
+    px = (x0[owner] + t * dx[owner]).astype(np.int64) - left
+    py = (y0[owner] + t * dy[owner]).astype(np.int64) - top
+    np.clip(px, 0, width - 1, out=px)
+    np.clip(py, 0, height - 1, out=py)
+    return px * height + py, index[owner], stride
+
+
+def _blend_density(pixels, region, density, color):
+    """Tone-map a (width, height) sample count image and blend it into `pixels`."""
+    left, top = region.left, region.top
+    width, height = region.width, region.height
+    hit = density > 0
+    intensity = LOD_MIN_INTENSITY + (1 - LOD_MIN_INTENSITY) * np.minimum(
+        np.log(density[hit]) / np.log(LOD_SATURATION), 1.0)
+    view = pixels[left:left + width, top:top + height]
+    base = view[hit].astype(np.float32)
+    view[hit] = (base + (np.array(color, dtype=np.float32) - base) * intensity[:, None]).astype(np.uint8)
+
+
+def splat_edges(pixels, region, sx0, sy0, sx1, sy1, color):
+    """
+    Accumulate screen-space segments into a density image and blend it into
+    `pixels` (a surfarray.pixels3d view) inside `region`.
+    """
+    sampled = _edge_samples(region, sx0, sy0, sx1, sy1)
+    if sampled is None:
+        return
+    samples, _, stride = sampled
+    density = np.bincount(samples, minlength=region.width * region.height) * stride
+    _blend_density(pixels, region, density.reshape(region.width, region.height), color)
+
+
+class HistoryDensity:
+    """
+    Edge density images of the graph as of any vertex m, for one view.
+
+    Edges are ordered by their larger endpoint, so the graph as of vertex m
+    owns a prefix of the edge arrays, and the pixel samples of all edges,
+    kept in edge order, a prefix of those.  The sample counts of the last
+    prefix drawn are kept too: moving to another m only counts the samples
+    between the two prefixes, so sweeping through the history costs what
+    changes rather than a full rasterization per step.  Everything is
+    dropped when the graph or the view changes.
+    """
+    def __init__(self):
+        self._key = None
+        self._samples = None
+        self._ends = None
+        self._stride = 1
+        self._counts = None
+        self._cut = 0
+
+    def density(self, graph, region, transform, xs, ys, m):
+        """(width, height) density image of the edges between vertices 1..m, or None."""
+        key = (graph.revision(), tuple(region), transform)
+        if key != self._key:
+            self._key = key
+            edge_hi, edge_lo = graph.adjacency.edge_arrays()
+            hi = np.frombuffer(edge_hi, dtype=np.intc)
+            lo = np.frombuffer(edge_lo, dtype=np.intc)
+            sampled = _edge_samples(region, xs[hi], ys[hi], xs[lo], ys[lo], in_order=True)
+            if sampled is None:
+                self._samples = None
+            else:
+                samples, owners, self._stride = sampled
+                self._samples = samples.astype(np.int32)
+                # Samples of edges [0, k) end at ends[k]
+                self._ends = np.searchsorted(owners, np.arange(len(hi) + 1))
+                self._counts = np.zeros(region.width * region.height, dtype=np.int64)
+                self._cut = 0
+        if self._samples is None:
+            return None
+
+        cut = int(self._ends[graph.adjacency.prefix_length(m)])
+        size = len(self._counts)
+        if cut > self._cut:
+            self._counts += np.bincount(self._samples[self._cut:cut], minlength=size)
+        elif cut < self._cut:
+            self._counts -= np.bincount(self._samples[cut:self._cut], minlength=size)
+        self._cut = cut
+        return (self._counts * self._stride).reshape(region.width, region.height)
+
+
+def splat_vertices(pixels, region, sx, sy, colors, radius):
+    """
+    Draw vertices as filled discs of `radius` pixels (at least one pixel)
+    into `pixels` inside `region`. Later vertices are drawn on top.
+    """
+    left, top = region.left, region.top
+    width, height = region.width, region.height
+    if not len(sx) or width <= 0 or height <= 0:
+        return
+    r = int(radius)
+    px = np.floor(sx).astype(np.int64) - left
+    py = np.floor(sy).astype(np.int64) - top
+    inside = (px >= -r) & (px < width + r) & (py >= -r) & (py < height + r)
+    px, py, colors = px[inside], py[inside], colors[inside]
+    if not len(px):
+        return
+
+    # Only the topmost vertex per center pixel can be seen, so each pixel's
+    # disc is stamped once no matter how many vertices share it
+    flat = (px + r) * (height + 2 * r) + (py + r)
+    _, last = np.unique(flat[::-1], return_index=True)
+    last = len(flat) - 1 - last
+    last.sort()
+    px, py, colors = px[last], py[last], colors[last]
+
+    view = pixels[left:left + width, top:top + height]
+    for dx in range(-r, r + 1):
+        for dy in range(-r, r + 1):
+            if dx * dx + dy * dy > r * r:
+                continue
+            x = px + dx
+            y = py + dy
+            ok = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+            view[x[ok], y[ok]] = colors[ok]
+
+
+def vertex_colors(store, count):
+    """RGB rows for vertex ids 1..count (custom colors included)."""
+    numbers = np.frombuffer(store.color_numbers, dtype=np.int8)[1:count + 1]
+    colors = _PALETTE[numbers].astype(np.uint8)
+    for v_id, rgb in store.custom_colors.items():
+        if v_id <= count:
+            colors[v_id - 1] = rgb[:3]
+    return colors
+
+
+def draw_splatted(surface, region, graph, transform, visible_limit, edge_color=None, vertex_radius=None,
+                  history=None):
+    """
+    Rasterize the graph's edges (as a density image, if `edge_color` is
+    given) and vertices (as discs, if `vertex_radius` is given) into
+    `surface` inside `region`. `transform` is (scale, shift_x, shift_y)
+    mapping world to surface coordinates.  With a `visible_limit`, a
+    HistoryDensity passed as `history` keeps the edge samples between calls.
+    """
+    store = graph.store
+    count = len(store) if not visible_limit else min(visible_limit, len(store))
+    scale, shift_x, shift_y = transform
+    xs = np.frombuffer(store.xs, dtype=np.float64) * scale + shift_x
+    ys = np.frombuffer(store.ys, dtype=np.float64) * scale + shift_y
+
+    pixels = pygame.surfarray.pixels3d(surface)
+    try:
+        if edge_color is not None and visible_limit and history is not None:
+            density = history.density(graph, region, transform, xs, ys, count)
+            if density is not None:
+                _blend_density(pixels, region, density, edge_color)
+        elif edge_color is not None:
+            # The edges among vertices 1..count are a prefix of the edge arrays
+            hi, lo = graph.adjacency.edge_prefix(count)
+            splat_edges(pixels, region, xs[hi], ys[hi], xs[lo], ys[lo], edge_color)
+        if vertex_radius is not None:
+            splat_vertices(pixels, region, xs[1:count + 1], ys[1:count + 1],
+                           vertex_colors(store, count), vertex_radius)
+    finally:
+        del pixels
@@ -3,6 +3,8 @@ import pygame
 import sys
 from graph import Graph
 from renderer import Renderer
+from background_task import BackgroundTask
+from construction_log import ConstructionLog
 
 # --- Setup ---
 pygame.init()
@@ -12,7 +14,7 @@ clock = pygame.time.Clock()
 
 # UI Constants
 UI_PANEL_WIDTH = 200
-BUTTON_HEIGHT = 40
+BUTTON_HEIGHT = 30
 BUTTON_MARGIN = 10
 BUTTON_COLOR = (70, 130, 180)
 BUTTON_HOVER_COLOR = (100, 149, 237)
@@ -36,6 +38,31 @@ font = pygame.font.SysFont('Arial', 16)
 title_font = pygame.font.SysFont('Arial', 18, bold=True)
 mouse_pos = (0, 0)
 
+# Retained drawing: the window is only repainted when the graph layer or the
+# panel state changed, or after something painted over it (input box, resize)
+last_ui_state = None
+full_redraw = True
+
+# Frame profiler (P toggles the overlay, D dumps the samples to CSV)
+PROFILE_CSV = "frame_profile.csv"
+profiler = renderer.profiler
+profiler_font = pygame.font.SysFont('Courier New', 14, bold=True)
+profiler_lines = []
+profiler_refreshed = 0
+
+# Long operations (generate, redraw) run on a worker thread against a copy
+# of the graph; the copy replaces `graph` once the task finishes.  Commands
+# that would change the graph meanwhile are refused (Esc cancels the task).
+task = None
+TASK_BLOCKED_COMMANDS = {"start", "random", "add_vertex", "redraw", "layout_mode", "incremental",
+                         "generate_1k", "generate_10k", "optimize", "load_snapshot", "replay_log",
+                         "undo", "redo"}
+
+# Binary snapshot written by F5 and read back by F9
+SNAPSHOT_PATH = "graph.snapshot"
+# Construction log written by F6 and replayed by F10
+LOG_PATH = "construction.log"
+
 # Button definitions
 class Button:
     def __init__(self, x, y, width, height, text, command, description=""):
@@ -60,53 +87,163 @@ class Button:
     def is_clicked(self, pos):
         return self.rect.collidepoint(pos)
 
+class HistoryScrubber:
+    """
+    Slider along the bottom of the graph area that sets the Gm limit:
+    dragging it sweeps the view through the construction history, from the
+    starting triangle (left) to the whole graph (right end).
+    """
+    def __init__(self):
+        self.rect = pygame.Rect(0, 0, 0, 12)
+        self.hovered = False
+        self.dragging = False
+
+    def place(self, width, height):
+        self.rect = pygame.Rect(UI_PANEL_WIDTH + 20, height - 24, max(1, width - UI_PANEL_WIDTH - 40), 12)
+
+    def update(self, mouse_pos):
+        self.hovered = self.is_clicked(mouse_pos)
+
+    def is_clicked(self, pos):
+        # A little taller than drawn, to be easy to grab
+        return self.rect.inflate(0, 12).collidepoint(pos)
+
+    def limit_at(self, x, count):
+        """Vertex limit for a mouse x position (None at the right end)."""
+        fraction = min(1.0, max(0.0, (x - self.rect.left) / self.rect.width))
+        limit = 3 + round(fraction * (count - 3))
+        return None if limit >= count else limit
+
+    def draw(self, surface, limit, count):
+        shown = count if limit is None else min(limit, count)
+        fraction = (shown - 3) / (count - 3) if count > 3 else 1.0
+        knob_x = self.rect.left + int(fraction * self.rect.width)
+        pygame.draw.rect(surface, (60, 60, 80), self.rect)
+        pygame.draw.rect(surface, BUTTON_HOVER_COLOR if self.hovered or self.dragging else BUTTON_COLOR,
+                         (self.rect.left, self.rect.top, knob_x - self.rect.left, self.rect.height))
+        pygame.draw.rect(surface, (255, 255, 255), (knob_x - 3, self.rect.top - 4, 6, self.rect.height + 8))
+        label = font.render(f"History: {shown:,} / {count:,}", True, (200, 200, 200))
+        surface.blit(label, (self.rect.left, self.rect.top - 22))
+
+# Only shown while a background task runs, under its progress bar in the
+# top left corner of the graph area (the panel is full)
+TASK_BAR_RECT = pygame.Rect(UI_PANEL_WIDTH + BUTTON_MARGIN, BUTTON_MARGIN, UI_PANEL_WIDTH - 2 * BUTTON_MARGIN, 10)
+cancel_button = Button(TASK_BAR_RECT.left, TASK_BAR_RECT.bottom + 6, TASK_BAR_RECT.width, 30, "Esc - Cancel Task",
+                       "cancel_task", "Stop the running task and keep the current graph")
+
+# Shown once the graph has grown past the starting triangle
+history_scrubber = HistoryScrubber()
+
 # Initialize buttons
 buttons = []
-y_pos = 60
+y_pos = 45
 button_width = UI_PANEL_WIDTH - 2 * BUTTON_MARGIN
 
 buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "S - Start Triangle", "start", "Create basic triangle V1-V2-V3"))
-y_pos += BUTTON_HEIGHT + 5
+y_pos += BUTTON_HEIGHT + 4
 
 buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "R - Random Vertex", "random", "Add random vertex to periphery"))
-y_pos += BUTTON_HEIGHT + 5
+y_pos += BUTTON_HEIGHT + 4
 
 buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "A - Add Vertex", "add_vertex", "Toggle add vertex mode"))
-y_pos += BUTTON_HEIGHT + 5
+y_pos += BUTTON_HEIGHT + 4
 
 buttons.append(Button(BUTTON_MARGIN, y_pos, button_width//2-2, BUTTON_HEIGHT, "Z+", "zoom_in", "Zoom In"))
 buttons.append(Button(BUTTON_MARGIN + button_width//2+2, y_pos, button_width//2-2, BUTTON_HEIGHT, "Z-", "zoom_out", "Zoom Out"))
-y_pos += BUTTON_HEIGHT + 5
+y_pos += BUTTON_HEIGHT + 4
 
 buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "C - Center", "center", "Center and fit graph"))
-y_pos += BUTTON_HEIGHT + 5
+y_pos += BUTTON_HEIGHT + 4
 
 buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "T - Toggle View", "toggle", "Toggle index/color view"))
-y_pos += BUTTON_HEIGHT + 5
+y_pos += BUTTON_HEIGHT + 4
 
 buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "Toggle Curves", "toggle_curves", "Toggle curved/straight edges"))
-y_pos += BUTTON_HEIGHT + 5
+y_pos += BUTTON_HEIGHT + 4
 
-buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "Gm - Go to Vertex", "goto", "Show vertices up to m"))
-y_pos += BUTTON_HEIGHT + 5
+buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "Gm - Go to Vertex", "goto", "Show vertices up to m (or drag the history bar)"))
+y_pos += BUTTON_HEIGHT + 4
 
-buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "Redraw", "redraw", "Optimize vertex positions"))
-y_pos += BUTTON_HEIGHT + 15
+buttons.append(Button(BUTTON_MARGIN, y_pos, button_width//2-2, BUTTON_HEIGHT, "Redraw", "redraw", "Optimize vertex positions"))
+buttons.append(Button(BUTTON_MARGIN + button_width//2+2, y_pos, button_width//2-2, BUTTON_HEIGHT, "L - Layout", "layout_mode", "Cycle redraw layout mode"))
+y_pos += BUTTON_HEIGHT + 4
+
+buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "I - Incremental", "incremental", "Relax locally after each insertion"))
+y_pos += BUTTON_HEIGHT + 10
 
 buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "Clear Selection", "clear_selection", "Clear vertex selection"))
-y_pos += BUTTON_HEIGHT + 15
+y_pos += BUTTON_HEIGHT + 4
 
-# Performance testing buttons
-buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "Generate 1K", "generate_1k", "Generate 1000 vertices"))
-y_pos += BUTTON_HEIGHT + 5
+buttons.append(Button(BUTTON_MARGIN, y_pos, button_width//2-2, BUTTON_HEIGHT, "Undo", "undo", "Undo last change (Ctrl+Z)"))
+buttons.append(Button(BUTTON_MARGIN + button_width//2+2, y_pos, button_width//2-2, BUTTON_HEIGHT, "Redo", "redo", "Redo undone change (Ctrl+Y)"))
+y_pos += BUTTON_HEIGHT + 10
 
-buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "Generate 10K", "generate_10k", "Generate 10000 vertices"))
-y_pos += BUTTON_HEIGHT + 5
+# Performance testing buttons
+buttons.append(Button(BUTTON_MARGIN, y_pos, button_width//2-2, BUTTON_HEIGHT, "Gen 1K", "generate_1k", "Generate 1000 vertices"))
+buttons.append(Button(BUTTON_MARGIN + button_width//2+2, y_pos, button_width//2-2, BUTTON_HEIGHT, "Gen 10K", "generate_10k", "Generate 10000 vertices"))
+y_pos += BUTTON_HEIGHT + 4
 
 buttons.append(Button(BUTTON_MARGIN, y_pos, button_width, BUTTON_HEIGHT, "Optimize Large", "optimize", "Optimize for large graphs"))
-y_pos += BUTTON_HEIGHT + 5
+y_pos += BUTTON_HEIGHT + 4
 
 # UI Drawing Functions
+def get_status_texts():
+    return [
+        f"Vertices: {len(graph.vertices)}",
+        f"Edges: {len(graph.edges)}",
+        f"Periphery: {len(graph.periphery)}",
+        f"Selected: {len(selected_vertices)}",
+        f"Visible: {'All' if visible_vertex_limit is None else f'≤{visible_vertex_limit}'}",
+        f"Mode: {'Add Vertex' if add_vertex_mode else 'Pan/Select'}",
+        f"View: {'Index' if renderer.show_index else 'Color'}",
+        f"Edges: {'Curved' if renderer.use_curved_edges else 'Straight'}",
+        f"Layout: {graph.layout_mode}",
+        f"Incremental: {'ON' if graph.incremental_layout else 'OFF'}",
+        f"Undo: {graph.history.undo_count()}  Redo: {graph.history.redo_count()}",
+        f"Task: {task.status_text() if task else 'idle'}"
+    ]
+
+def get_ui_state():
+    """Everything the panel shows; it only needs redrawing when this changes."""
+    hovered = tuple(button.hovered for button in buttons) + (cancel_button.hovered,)
+    scrubber = (history_scrubber.hovered, history_scrubber.dragging) if history_shown() else ()
+    profile = tuple(get_profiler_lines()) if profiler.enabled else ()
+    return (tuple(get_status_texts()), hovered, scrubber, add_vertex_mode, screen.get_size(), profile)
+
+def history_shown():
+    return len(graph.vertices) > 3
+
+def step_history(delta):
+    """Move the Gm limit by `delta` vertices (the arrow keys)."""
+    global visible_vertex_limit
+    count = len(graph.vertices)
+    if count <= 3:
+        return
+    current = count if visible_vertex_limit is None else min(visible_vertex_limit, count)
+    limit = max(3, current + delta)
+    visible_vertex_limit = None if limit >= count else limit
+
+def get_profiler_lines():
+    """Overlay text, refreshed a few times a second so it stays readable."""
+    global profiler_lines, profiler_refreshed
+    now = pygame.time.get_ticks()
+    if not profiler_lines or now - profiler_refreshed >= 250:
+        profiler_refreshed = now
+        profiler_lines = [f"{'stage':<10}{'p50':>8}{'p95':>8}{'p99':>8}   ms"]
+        for stage, count, (p50, p95, p99) in profiler.percentiles():
+            profiler_lines.append(f"{stage:<10}{p50:8.2f}{p95:8.2f}{p99:8.2f}")
+    return profiler_lines
+
+def draw_profiler_overlay():
+    """Draw rolling per-stage frame time percentiles over the graph area"""
+    lines = get_profiler_lines()
+    width = max(profiler_font.size(line)[0] for line in lines) + 16
+    box = pygame.Surface((width, len(lines) * 16 + 12), pygame.SRCALPHA)
+    box.fill((0, 0, 0, 180))
+    for i, line in enumerate(lines):
+        box.blit(profiler_font.render(line, True, (255, 255, 255) if i else (255, 215, 0)), (8, 6 + i * 16))
+    screen.blit(box, (screen.get_width() - width - 10, 10))
+
 def draw_ui():
     """Draw the user interface panel"""
     # Draw UI background
@@ -122,30 +259,28 @@ def draw_ui():
     for button in buttons:
         button.draw(screen)
     
-    # Draw status information
-    status_y = 450
-    status_texts = [
-        f"Vertices: {len(graph.vertices)}",
-        f"Edges: {len(graph.edges)}",
-        f"Periphery: {len(graph.periphery)}",
-        f"Selected: {len(selected_vertices)}",
-        f"Visible: {'All' if visible_vertex_limit is None else f'≤{visible_vertex_limit}'}",
-        f"Mode: {'Add Vertex' if add_vertex_mode else 'Pan/Select'}",
-        f"View: {'Index' if renderer.show_index else 'Color'}",
-        f"Edges: {'Curved' if renderer.use_curved_edges else 'Straight'}"
-    ]
+    # Draw status information below the last button
+    status_y = buttons[-1].rect.bottom + 12
+    status_texts = get_status_texts()
     
     for i, text in enumerate(status_texts):
         text_surface = font.render(text, True, (200, 200, 200))
-        screen.blit(text_surface, (10, status_y + i * 20))
+        screen.blit(text_surface, (10, status_y + i * 18))
     
     # Draw instructions
     if add_vertex_mode:
         instruction_text = font.render("Click 2 periphery vertices", True, (255, 255, 100))
-        screen.blit(instruction_text, (10, status_y + len(status_texts) * 20 + 20))
+        screen.blit(instruction_text, (10, status_y + len(status_texts) * 18))
+
+    # Draw background task progress bar and cancel button
+    if task:
+        bar = TASK_BAR_RECT
+        pygame.draw.rect(screen, (60, 60, 80), bar)
+        pygame.draw.rect(screen, (100, 200, 100), (bar.x, bar.y, int(bar.width * task.fraction()), bar.height))
+        cancel_button.draw(screen)
     
     # Draw hovered button description
-    for button in buttons:
+    for button in buttons + ([cancel_button] if task else []):
         if button.hovered and button.description:
             desc_surface = font.render(button.description, True, (200, 255, 200))
             screen.blit(desc_surface, (10, screen.get_height() - 30))
@@ -176,11 +311,10 @@ def get_user_input(prompt):
         # Draw everything
         screen.fill((20, 20, 40))
         
-        # Draw graph area
-        graph_surface = pygame.Surface((screen.get_width() - UI_PANEL_WIDTH, screen.get_height()))
-        graph_surface.fill((20, 20, 40))
-        renderer.draw_graph_on_surface(graph_surface, graph, visible_vertex_limit, selected_vertices, offset_x=0)
-        screen.blit(graph_surface, (UI_PANEL_WIDTH, 0))
+        # Draw graph area (from the cached layer)
+        layer, _ = renderer.render_layer(graph, (screen.get_width() - UI_PANEL_WIDTH, screen.get_height()),
+                                         visible_vertex_limit, selected_vertices)
+        screen.blit(layer, (UI_PANEL_WIDTH, 0))
         
         # Draw UI
         draw_ui()
@@ -196,13 +330,75 @@ def get_user_input(prompt):
         screen.blit(text_surface, (input_box.x + 5, input_box.y + 15))
         
         pygame.display.flip()
+        clock.tick(60)
     
     return user_text
 
+def start_task(label, function):
+    """
+    Run `function(progress)` in the background; it returns the graph that
+    replaces the current one and whether to refit the view to it.
+    """
+    global task, add_vertex_mode
+    # Clicks could otherwise still edit the graph that is about to be replaced
+    selected_vertices.clear()
+    add_vertex_mode = False
+    task = BackgroundTask(label, function)
+
+def finish_task():
+    """Swap in the graph of the finished task (between two frames)."""
+    global task, graph, full_redraw
+    finished, task = task, None
+    full_redraw = True
+    if finished.error is not None:
+        print(f"{finished.label} failed: {finished.error}")
+    elif finished.cancelled or finished.result is None:
+        print(f"{finished.label} cancelled.")
+    else:
+        graph, refit = finished.result
+        renderer.invalidate_layer()
+        if refit:
+            renderer.reset_view(screen.get_width() - UI_PANEL_WIDTH, screen.get_height(), graph.get_bounding_box())
+
+def generate_in_background(count):
+    new_graph = graph.copy(data=False)
+
+    def work(progress):
+        stats = new_graph.generate_large_graph(count, progress=progress)
+        print(f"Generated graph statistics: {stats}")
+        return new_graph, True
+
+    print(f"Generating {count} vertices for performance testing...")
+    start_task(f"Generating {count}", work)
+
+def redraw_in_background():
+    source = graph
+
+    def work(progress):
+        new_graph = source.copy()
+        new_graph.redraw_graph(progress=progress)
+        return new_graph, False
+
+    start_task("Redrawing", work)
+
+def replay_in_background(log, steps):
+    new_graph = graph.copy(data=False)
+
+    def work(progress):
+        log.replay(new_graph, steps, progress)
+        print(f"Replayed {len(new_graph.log)} steps: {len(new_graph.vertices)} vertices")
+        return new_graph, True
+
+    start_task("Replaying", work)
+
 def handle_button_command(command):
     """Handle button commands"""
-    global add_vertex_mode, visible_vertex_limit
+    global add_vertex_mode, visible_vertex_limit, full_redraw
     
+    if task and command in TASK_BLOCKED_COMMANDS:
+        print(f"Busy ({task.status_text()}); press Esc to cancel.")
+        return
+
     if command == "start":
         graph.start_basic_graph()
         selected_vertices.clear()
@@ -237,6 +433,8 @@ def handle_button_command(command):
         print(f"Curved edges: {'ON' if renderer.use_curved_edges else 'OFF'}")
         
     elif command == "goto":
+        # The input box paints over the window
+        full_redraw = True
         try:
             m_str = get_user_input("Enter vertex index 'm':")
             if m_str.strip():
@@ -246,35 +444,97 @@ def handle_button_command(command):
             print("Invalid input. Please enter a number.")
             
     elif command == "redraw":
-        graph.redraw_graph()
+        redraw_in_background()
         
+    elif command == "layout_mode":
+        print(f"Layout mode: {graph.cycle_layout_mode()}")
+        
+    elif command == "incremental":
+        print(f"Incremental layout: {'ON' if graph.toggle_incremental_layout() else 'OFF'}")
+        
+    elif command in ("undo", "redo"):
+        kind = graph.undo() if command == "undo" else graph.redo()
+        if kind is None:
+            print(f"Nothing to {command}.")
+        else:
+            # The selection may name a vertex that is gone now
+            selected_vertices.clear()
+            print(f"{command.capitalize()}: {kind}")
+
     elif command == "clear_selection":
         selected_vertices.clear()
         add_vertex_mode = False
         
     elif command == "generate_1k":
-        print("Generating 1000 vertices for performance testing...")
-        stats = graph.generate_large_graph(1000)
-        renderer.reset_view(screen.get_width() - UI_PANEL_WIDTH, screen.get_height(), graph.get_bounding_box())
-        print(f"Generated graph statistics: {stats}")
+        generate_in_background(1000)
         
     elif command == "generate_10k":
-        print("Generating 10000 vertices for performance testing...")
-        stats = graph.generate_large_graph(10000)
-        renderer.reset_view(screen.get_width() - UI_PANEL_WIDTH, screen.get_height(), graph.get_bounding_box())
-        print(f"Generated graph statistics: {stats}")
+        generate_in_background(10000)
+
+    elif command == "cancel_task":
+        if task:
+            task.cancel()
         
     elif command == "optimize":
         graph.optimize_for_large_graphs()
         print("Large graph optimizations applied.")
 
+    elif command == "save_snapshot":
+        size = graph.save_snapshot(SNAPSHOT_PATH)
+        print(f"Graph saved to {SNAPSHOT_PATH} ({size:,} bytes)")
+
+    elif command == "load_snapshot":
+        try:
+            graph.load_snapshot(SNAPSHOT_PATH)
+        except (OSError, ValueError) as e:
+            print(f"Could not load snapshot: {e}")
+        else:
+            selected_vertices.clear()
+            visible_vertex_limit = None
+            add_vertex_mode = False
+            renderer.reset_view(screen.get_width() - UI_PANEL_WIDTH, screen.get_height(), graph.get_bounding_box())
+            print(f"Loaded {len(graph.vertices)} vertices, {len(graph.edges)} edges from {SNAPSHOT_PATH}")
+
+    elif command == "save_log":
+        if graph.log is None:
+            print("This graph has no construction log (it was loaded, not built here).")
+        else:
+            size = graph.log.save(LOG_PATH)
+            print(f"Construction log ({len(graph.log)} steps, {size:,} bytes) written to {LOG_PATH}")
+
+    elif command == "replay_log":
+        # The input box paints over the window
+        full_redraw = True
+        try:
+            log = ConstructionLog.load(LOG_PATH)
+            text = get_user_input(f"Replay to step (0-{len(log)}, blank = all):")
+            steps = int(text) if text.strip() else None
+        except (OSError, ValueError) as e:
+            print(f"Could not replay the construction log: {e}")
+        else:
+            replay_in_background(log, steps)
+
+    elif command == "profiler":
+        print(f"Frame profiler: {'ON' if profiler.toggle() else 'OFF'}")
+
+    elif command == "dump_profile":
+        if profiler.frames:
+            count = profiler.dump_csv(PROFILE_CSV)
+            print(f"Frame profile ({count} frames) written to {PROFILE_CSV}")
+        else:
+            print("No frame profile recorded yet; press P to start profiling.")
+
 # --- Main Loop ---
 while running:
+    profiler.begin_frame()
     mouse_pos = pygame.mouse.get_pos()
     
     # Update button hover states
     for button in buttons:
         button.update(mouse_pos)
+    cancel_button.update(mouse_pos)
+    history_scrubber.place(*screen.get_size())
+    history_scrubber.update(mouse_pos)
     
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
@@ -292,7 +552,12 @@ while running:
         if event.type == pygame.MOUSEBUTTONDOWN:
             if event.button == 1: # Left mouse button
                 # Check if clicking on UI panel
-                if mouse_pos[0] < UI_PANEL_WIDTH:
+                if history_shown() and history_scrubber.is_clicked(event.pos):
+                    history_scrubber.dragging = True
+                    visible_vertex_limit = history_scrubber.limit_at(event.pos[0], len(graph.vertices))
+                elif task and cancel_button.is_clicked(event.pos):
+                    handle_button_command("cancel_task")
+                elif mouse_pos[0] < UI_PANEL_WIDTH:
                     # Handle button clicks
                     for button in buttons:
                         if button.is_clicked(mouse_pos):
@@ -330,9 +595,12 @@ while running:
             if event.button == 1: # Left mouse button
                 panning = False
                 last_pan_pos = None
+                history_scrubber.dragging = False
 
         if event.type == pygame.MOUSEMOTION:
-            if panning and event.pos[0] > UI_PANEL_WIDTH:
+            if history_scrubber.dragging:
+                visible_vertex_limit = history_scrubber.limit_at(event.pos[0], len(graph.vertices))
+            elif panning and event.pos[0] > UI_PANEL_WIDTH:
                 # Pan only in graph area
                 if last_pan_pos:
                     dx, dy = event.pos[0] - last_pan_pos[0], event.pos[1] - last_pan_pos[1]
@@ -342,10 +610,16 @@ while running:
         
         if event.type == pygame.VIDEORESIZE:
             renderer.reset_view(event.w - UI_PANEL_WIDTH, event.h, graph.get_bounding_box())
+            full_redraw = True
 
         # --- Keyboard Commands (still supported) ---
         if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_s:
+            if event.mod & pygame.KMOD_CTRL:
+                if event.key == pygame.K_z:
+                    handle_button_command("redo" if event.mod & pygame.KMOD_SHIFT else "undo")
+                elif event.key == pygame.K_y:
+                    handle_button_command("redo")
+            elif event.key == pygame.K_s:
                 handle_button_command("start")
             elif event.key == pygame.K_r:
                 handle_button_command("random")
@@ -357,20 +631,54 @@ while running:
                 handle_button_command("goto")
             elif event.key == pygame.K_a:
                 handle_button_command("add_vertex")
-
-    # --- Drawing ---
-    screen.fill((15, 15, 25))  # Darker background for better contrast
-    
-    # Draw graph in the main area (offset by UI panel width)
-    graph_surface = pygame.Surface((screen.get_width() - UI_PANEL_WIDTH, screen.get_height()))
-    graph_surface.fill((25, 25, 35))  # Slightly lighter than main background
-    renderer.draw_graph_on_surface(graph_surface, graph, visible_vertex_limit, selected_vertices, offset_x=0)
-    screen.blit(graph_surface, (UI_PANEL_WIDTH, 0))
-    
-    # Draw UI panel
-    draw_ui()
-    
-    pygame.display.flip()
+            elif event.key == pygame.K_l:
+                handle_button_command("layout_mode")
+            elif event.key == pygame.K_i:
+                handle_button_command("incremental")
+            elif event.key == pygame.K_p:
+                handle_button_command("profiler")
+            elif event.key == pygame.K_d:
+                handle_button_command("dump_profile")
+            elif event.key == pygame.K_F5:
+                handle_button_command("save_snapshot")
+            elif event.key == pygame.K_F9:
+                handle_button_command("load_snapshot")
+            elif event.key == pygame.K_F6:
+                handle_button_command("save_log")
+            elif event.key == pygame.K_F10:
+                handle_button_command("replay_log")
+            elif event.key == pygame.K_ESCAPE:
+                handle_button_command("cancel_task")
+            elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                # Step through the history one vertex (Shift: 1% of the graph) at a time
+                step = max(1, len(graph.vertices) // 100) if event.mod & pygame.KMOD_SHIFT else 1
+                step_history(step if event.key == pygame.K_RIGHT else -step)
+    if task and task.finished:
+        finish_task()
+    profiler.lap('events')
+
+    # --- Drawing (retained: nothing is drawn unless something changed) ---
+    # The graph comes from the renderer's cached layer, which itself only
+    # redraws what changed (pans just scroll it)
+    graph_rect = pygame.Rect(UI_PANEL_WIDTH, 0, screen.get_width() - UI_PANEL_WIDTH, screen.get_height())
+    layer, changed = renderer.render_layer(graph, graph_rect.size, visible_vertex_limit, selected_vertices)
+    ui_state = get_ui_state()
+    drawn = changed or ui_state != last_ui_state or full_redraw
+    if drawn:
+        screen.fill((15, 15, 25))  # Darker background for better contrast
+        screen.blit(layer, graph_rect.topleft)
+        # The panel (and hover descriptions overlapping the graph) on top
+        draw_ui()
+        if history_shown():
+            history_scrubber.draw(screen, visible_vertex_limit, len(graph.vertices))
+        if profiler.enabled:
+            draw_profiler_overlay()
+        last_ui_state = ui_state
+        full_redraw = False
+        profiler.lap('ui')
+        pygame.display.flip()
+        profiler.lap('flip')
+    profiler.end_frame(idle=not drawn)
     clock.tick(60)
 
 pygame.quit()
\ No newline at end of file
@@ -0,0 +1,151 @@
+# periphery.py
+from collections.abc import Collection
+import random
+
+
+class Periphery(Collection):
+    """
+    The outer contour of the graph kept as a doubly linked ring.
+
+    Every vertex on the contour knows its clockwise successor and predecessor,
+    so walking, cutting and splicing an arc costs time proportional to the arc
+    instead of the whole contour.  Iterating the ring reads it in clockwise
+    order starting from `head`.
+    """
+    def __init__(self, vertex_ids=()):
+        self._next = {}
+        self._prev = {}
+        self.head = None
+        # Unordered pool of members with each member's slot in it, so random
+        # picks and removals are O(1) without touching the ring order.
+        self._members = []
+        self._slot = {}
+        self.reset(vertex_ids)
+
+    def reset(self, vertex_ids):
+        """Replace the ring with the given vertices in clockwise order."""
+        self.clear()
+        vertex_ids = list(vertex_ids)
+        count = len(vertex_ids)
+        for i, v_id in enumerate(vertex_ids):
+            self._next[v_id] = vertex_ids[(i + 1) % count]
+            self._prev[v_id] = vertex_ids[i - 1]
+            self._add_member(v_id)
+        if vertex_ids:
+            self.head = vertex_ids[0]
+
+    def clear(self):
+        self._next.clear()
+        self._prev.clear()
+        self._members.clear()
+        self._slot.clear()
+        self.head = None
+
+    def _add_member(self, v_id):
+        self._slot[v_id] = len(self._members)
+        self._members.append(v_id)
+
+    def _remove_member(self, v_id):
+        # Swap the last member into the freed slot
+        slot = self._slot.pop(v_id)
+        last = self._members.pop()
+        if last != v_id:
+            self._members[slot] = last
+            self._slot[last] = slot
+
+    def __len__(self):
+        return len(self._next)
+
+    def __contains__(self, v_id):
+        return v_id in self._next
+
+    def __iter__(self):
+        if self.head is None:
+            return
+        v_id = self.head
+        for _ in range(len(self._next)):
+            yield v_id
+            v_id = self._next[v_id]
+
+    def __repr__(self):
+        return f"Periphery({list(self)})"
+
+    def next(self, v_id):
+        """Clockwise successor of a periphery vertex."""
+        return self._next[v_id]
+
+    def prev(self, v_id):
+        """Counter-clockwise predecessor of a periphery vertex."""
+        return self._prev[v_id]
+
+    def sample_pair(self, rng=random):
+        """Pick two distinct periphery vertices uniformly at random (fast path)."""
+        members = self._members
+        count = len(members)
+        first = int(rng.random() * count)
+        second = int(rng.random() * (count - 1))
+        if second >= first:
+            second += 1
+        return members[first], members[second]
+
+    def edges(self):
+        """Yield consecutive (v, next(v)) pairs around the contour."""
+        if len(self._next) < 2:
+            return
+        for v_id in self:
+            yield v_id, self._next[v_id]
+
+    def arc(self, vp_id, vq_id):
+        """Clockwise list of vertices from Vp to Vq, both included."""
+        arc = [vp_id]
+        v_id = vp_id
+        while v_id != vq_id:
+            v_id = self._next[v_id]
+            arc.append(v_id)
+        return arc
+
+    def splice(self, vp_id, vq_id, new_id):
+        """
+        Cut the vertices strictly between Vp and Vq out of the ring and put
+        `new_id` in their place.  Returns the removed interior arc.
+        """
+        removed = []
+        v_id = self._next[vp_id]
+        while v_id != vq_id:
+            removed.append(v_id)
+            following = self._next[v_id]
+            del self._next[v_id]
+            del self._prev[v_id]
+            self._remove_member(v_id)
+            v_id = following
+
+        self._next[vp_id] = new_id
+        self._prev[new_id] = vp_id
+        self._next[new_id] = vq_id
+        self._prev[vq_id] = new_id
+        self._add_member(new_id)
+
+        # Keep the reading order stable: if the head was cut away, the
+        # contour now starts at Vq (the first survivor after the cut).
+        if self.head not in self._next:
+            self.head = vq_id
+        return removed
+
+    def unsplice(self, vp_id, vq_id, new_id, removed, head=None):
+        """
+        Undo `splice`: take `new_id` out from between Vp and Vq and put the
+        `removed` arc back, optionally restoring the old head.
+        """
+        del self._next[new_id]
+        del self._prev[new_id]
+        self._remove_member(new_id)
+        previous = vp_id
+        for v_id in removed:
+            self._next[previous] = v_id
+            self._prev[v_id] = previous
+            self._add_member(v_id)
+            previous = v_id
+        self._next[previous] = vq_id
+        self._prev[vq_id] = previous
+        if head is not None:
+            self.head = head
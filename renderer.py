@@ -1,6 +1,11 @@
 # renderer.py (Completed)
 import pygame
 import math
+import numpy as np
+from label_cache import LabelCache, MIN_LABEL_SIZE
+from curve_cache import CurveCache
+from frame_profiler import FrameProfiler
+from lod import LOD_VECTOR_RADIUS, LOD_MAX_VECTOR_VERTICES, LOD_MAX_VECTOR_EDGES, HistoryDensity, draw_splatted
 
 class Renderer:
     """Handles all drawing to the screen."""
@@ -11,6 +16,22 @@ class Renderer:
         self.zoom_level = 1.0
         self.show_index = True
         self.use_curved_edges = False  # Curved edges disabled by default for cleaner appearance
+        self.label_cache = LabelCache()
+        self.curve_cache = CurveCache()
+        # Stage timings for the profiler overlay (disabled until toggled)
+        self.profiler = FrameProfiler()
+        # Retained mode: the graph is rasterized once into a cached layer
+        # that is redrawn only when the graph, zoom, selection or view options
+        # change; pans scroll it and redraw just the exposed strips.
+        self.background = (25, 25, 35)
+        self._layer = None
+        self._layer_key = None
+        self._layer_pan = None
+        # Edge samples kept while the Gm limit sweeps through the history
+        self.history_density = HistoryDensity()
+        # Screen positions by vertex id for the current view (see screen_positions)
+        self._screen = {}
+        self._screen_key = None
 
     def reset_view(self, screen_w, screen_h, graph_bounds):
         if not graph_bounds or graph_bounds[2] == 0 or graph_bounds[3] == 0:
@@ -54,54 +75,168 @@ class Renderer:
         if selected_ids is None: selected_ids = []
         self._draw_graph_internal(surface, graph, visible_limit, selected_ids, offset_x)
     
-    def _draw_graph_internal(self, surface, graph, visible_limit, selected_ids, offset_x):
-        """Internal method to draw graph on any surface."""
-        surface_width = surface.get_width()
-        surface_height = surface.get_height()
+    def render_layer(self, graph, size, visible_limit=None, selected_ids=None):
+        """
+        Return (layer, changed): the cached graph layer of the given size,
+        brought up to date with as little drawing as possible.
+        """
+        if selected_ids is None: selected_ids = []
+        key = (graph.revision(), self.zoom_level, tuple(selected_ids), visible_limit,
+               self.show_index, self.use_curved_edges)
+        layer = self._layer
+        if layer is None or layer.get_size() != tuple(size):
+            layer = self._layer = pygame.Surface(size)
+        elif key == self._layer_key:
+            dx = self.pan_offset[0] - self._layer_pan[0]
+            dy = self.pan_offset[1] - self._layer_pan[1]
+            if dx == 0 and dy == 0:
+                return layer, False
+            width, height = layer.get_size()
+            if dx == int(dx) and dy == int(dy) and abs(dx) < width and abs(dy) < height:
+                self._scroll_layer(graph, int(dx), int(dy), visible_limit, selected_ids)
+                return layer, True
+
+        layer.fill(self.background)
+        self.profiler.lap('layer')
+        self._draw_graph_internal(layer, graph, visible_limit, selected_ids, 0)
+        self._layer_key = key
+        self._layer_pan = list(self.pan_offset)
+        return layer, True
+
+    def invalidate_layer(self):
+        """Force the next render_layer call to redraw everything."""
+        self._layer_key = None
+        self._screen_key = None
+
+    def _scroll_layer(self, graph, dx, dy, visible_limit, selected_ids):
+        # Shift the existing pixels and redraw only the strips uncovered
+        layer = self._layer
+        width, height = layer.get_size()
+        layer.scroll(dx, dy)
+        self.profiler.lap('layer')
+        exposed = []
+        if dx > 0:
+            exposed.append(pygame.Rect(0, 0, dx, height))
+        elif dx < 0:
+            exposed.append(pygame.Rect(width + dx, 0, -dx, height))
+        if dy > 0:
+            exposed.append(pygame.Rect(0, 0, width, dy))
+        elif dy < 0:
+            exposed.append(pygame.Rect(0, height + dy, width, -dy))
+        for region in exposed:
+            layer.set_clip(region)
+            layer.fill(self.background, region)
+            self.profiler.lap('layer')
+            self._draw_graph_internal(layer, graph, visible_limit, selected_ids, 0, region)
+        layer.set_clip(None)
+        self._layer_pan = list(self.pan_offset)
+
+    def _draw_graph_internal(self, surface, graph, visible_limit, selected_ids, offset_x, region=None):
+        """Internal method to draw graph on any surface (or just a region of it)."""
+        if region is None:
+            region = surface.get_rect()
         
-        # Performance optimization: filter vertices and edges
-        if visible_limit:
-            visible_vertices = {k: v for k, v in graph.vertices.items() 
-                              if k <= visible_limit and self._is_vertex_visible(v.pos, surface_width, surface_height)}
+        # Level of detail: once even the largest vertices are only a few
+        # pixels across, edges and vertices are rasterized with NumPy (see
+        # lod.py) instead of drawn one shape at a time.
+        largest_radius = (18 + math.log(len(graph.store) + 1, 10) * 3) * self.zoom_level
+        low_detail = largest_radius < LOD_VECTOR_RADIUS
+        if visible_limit and visible_limit >= len(graph.store):
+            visible_limit = None
+        if low_detail:
+            visible_ids, visible_edges = [], []
+        elif visible_limit:
+            # The graph as of vertex m: ids 1..m and a prefix of the edge
+            # arrays, culled together in NumPy
+            visible_ids, visible_edges = self._cull_prefix(graph, visible_limit,
+                                                           self._visible_world_rect(region, offset_x))
         else:
-            # For large graphs (>1000 vertices), only render visible vertices
-            if len(graph.vertices) > 1000:
-                visible_vertices = {k: v for k, v in graph.vertices.items() 
-                                  if self._is_vertex_visible(v.pos, surface_width, surface_height)}
-            else:
-                visible_vertices = graph.vertices
-        
-        visible_edges = {e for e in graph.edges 
-                        if (e[0] in visible_vertices and e[1] in visible_vertices)}
+            # Cull through the graph's spatial index: only the grid cells under
+            # the viewport (plus a margin for partially visible vertices) are
+            # visited, so the cost follows what is on screen, not the graph size.
+            min_x, min_y, max_x, max_y = self._visible_world_rect(region, offset_x)
+            index = graph.spatial_index
+            visible_ids = index.vertices_in_rect(min_x, min_y, max_x, max_y)
+            # Edges are found by bounding box, so an edge crossing the view is
+            # drawn even when both of its endpoints are off-screen
+            visible_edges = index.edges_in_rect(min_x, min_y, max_x, max_y)
+            # Draw in id order so later vertices stay on top
+            visible_ids.sort()
+
+        # Crowded views are splatted too, even when shapes are large enough to see
+        splat_edges = low_detail or len(visible_edges) > LOD_MAX_VECTOR_EDGES
+        splat_vertices = low_detail or len(visible_ids) > LOD_MAX_VECTOR_VERTICES
+        transform = (self.zoom_level, self.pan_offset[0] - offset_x, self.pan_offset[1])
+
+        profiler = self.profiler
+        profiler.lap('cull')
+
+        periphery = graph.periphery
+        periphery_edges = []
+
+        if splat_edges:
+            draw_splatted(surface, region, graph, transform, visible_limit, edge_color=(140, 140, 160),
+                          history=self.history_density)
+            # Only the periphery is still drawn as lines, to highlight it
+            visible_edges = [(min(edge), max(edge)) for edge in periphery.edges()
+                             if not visible_limit or max(edge) <= visible_limit]
+
+        # Every endpoint and vertex drawn below is transformed in one batch
+        ids = visible_ids
+        if visible_edges:
+            lo_ids, hi_ids = zip(*visible_edges)
+            ids = visible_ids + list(lo_ids) + list(hi_ids)
+        screen = self.screen_positions(graph, ids, offset_x)
 
         # Draw edges with optional curves
-        for v1_id, v2_id in visible_edges:
-            pos1 = self._transform_with_offset(graph.vertices[v1_id].pos, offset_x)
-            pos2 = self._transform_with_offset(graph.vertices[v2_id].pos, offset_x)
+        edge_width = max(1, int(2 * self.zoom_level))
+        curved = self.use_curved_edges and self.zoom_level > 0.3
+        curved_edges = []
+        for edge in visible_edges:
+            v1_id, v2_id = edge
+            pos1 = screen[v1_id]
+            pos2 = screen[v2_id]
             
-            edge_width = max(1, int(2 * self.zoom_level))
+            # Periphery edges are highlighted on top afterwards
+            if v1_id in periphery and v2_id in periphery and (
+                    periphery.next(v1_id) == v2_id or periphery.next(v2_id) == v1_id):
+                periphery_edges.append((pos1, pos2))
             
-            # Use curved or straight edges based on setting
-            if self.use_curved_edges and self.zoom_level > 0.3:
-                self._draw_smooth_curved_edge(surface, pos1, pos2, (140, 140, 160), edge_width)
+            # Curves are drawn together afterwards; very short edges stay straight
+            if curved and (pos2[0] - pos1[0]) ** 2 + (pos2[1] - pos1[1]) ** 2 >= 100:
+                curved_edges.append(edge)
             else:
                 pygame.draw.line(surface, (140, 140, 160), pos1, pos2, edge_width)
+        if curved_edges:
+            self._draw_curved_edges(surface, graph, curved_edges, (140, 140, 160), edge_width, offset_x)
         
+        profiler.lap('edges')
+
         # Highlight periphery edges with cleaner appearance
-        if len(graph.periphery) > 1:
-            for i in range(len(graph.periphery)):
-                v1_id = graph.periphery[i]
-                v2_id = graph.periphery[(i + 1) % len(graph.periphery)]
-                if (v1_id, v2_id) in visible_edges or (v2_id, v1_id) in visible_edges:
-                    if v1_id in graph.vertices and v2_id in graph.vertices:
-                        pos1 = self._transform_with_offset(graph.vertices[v1_id].pos, offset_x)
-                        pos2 = self._transform_with_offset(graph.vertices[v2_id].pos, offset_x)
-                        edge_width = max(2, int(3 * self.zoom_level))
-                        pygame.draw.line(surface, (80, 200, 80), pos1, pos2, edge_width)
+        edge_width = max(2, int(3 * self.zoom_level))
+        for pos1, pos2 in periphery_edges:
+            pygame.draw.line(surface, (80, 200, 80), pos1, pos2, edge_width)
+        profiler.lap('periphery')
         
+        # Labels are skipped once they would be illegibly small
+        label_size = None
+        if self.show_index and int(14 * self.zoom_level) >= MIN_LABEL_SIZE:
+            label_size = max(10, int(14 * self.zoom_level))
+
+        if splat_vertices:
+            draw_splatted(surface, region, graph, transform, visible_limit,
+                          vertex_radius=min(largest_radius, LOD_VECTOR_RADIUS - 1))
+            visible_ids = []
+            selected = [v_id for v_id in selected_ids
+                        if v_id in graph.store and not (visible_limit and v_id > visible_limit)]
+            screen = self.screen_positions(graph, selected, offset_x)
+            for v_id in selected:
+                pygame.draw.circle(surface, (255, 215, 0), screen[v_id], LOD_VECTOR_RADIUS, 2)
+
         # Draw vertices with clean, professional appearance
-        for v_id, vertex in visible_vertices.items():
-            pos = self._transform_with_offset(vertex.pos, offset_x)
+        labels = []
+        for v_id in visible_ids:
+            pos = screen[v_id]
             
             # Variable radius based on vertex ID (more conservative scaling)
             base_radius = 18 + math.log(v_id + 1, 10) * 3
@@ -109,7 +244,7 @@ class Renderer:
             if radius < 4: continue
 
             # Color coding: periphery vertices are special
-            is_periphery = v_id in graph.periphery
+            is_periphery = v_id in periphery
             is_selected = v_id in selected_ids
             
             # Determine colors with cleaner appearance
@@ -127,107 +262,113 @@ class Renderer:
             # Outer border
             pygame.draw.circle(surface, outline_color, pos, radius + outline_width)
             # Inner fill
-            pygame.draw.circle(surface, vertex.color, pos, radius)
+            pygame.draw.circle(surface, graph.store.get_color(v_id), pos, radius)
             # Inner highlight for 3D effect
             highlight_pos = (pos[0] - radius//3, pos[1] - radius//3)
             highlight_radius = max(2, radius//3)
             pygame.draw.circle(surface, (255, 255, 255, 100), highlight_pos, highlight_radius)
 
-            # Draw vertex label with better contrast
-            if self.show_index:
-                font_size = max(10, int(14 * self.zoom_level))
-                if font_size >= 8:
-                    dynamic_font = pygame.font.SysFont('Arial', font_size, bold=True)
-                    # Draw text with outline for better readability
-                    text_surf = dynamic_font.render(str(v_id), True, (255, 255, 255))
-                    text_outline = dynamic_font.render(str(v_id), True, (0, 0, 0))
-                    text_rect = text_surf.get_rect(center=pos)
-                    
-                    # Draw outline
-                    for dx, dy in [(-1,-1), (-1,1), (1,-1), (1,1)]:
-                        outline_rect = text_rect.copy()
-                        outline_rect.x += dx
-                        outline_rect.y += dy
-                        surface.blit(text_outline, outline_rect)
-                    
-                    # Draw main text
-                    surface.blit(text_surf, text_rect)
+            if label_size:
+                labels.append((v_id, pos))
+        profiler.lap('vertices')
+
+        # Draw vertex labels with better contrast (cached, outline included),
+        # after the circles so they stay on top
+        for v_id, pos in labels:
+            label = self.label_cache.get(v_id, label_size)
+            surface.blit(label, label.get_rect(center=pos))
+        profiler.lap('labels')
     
+    def _cull_prefix(self, graph, m, rect):
+        """
+        Vertices (in id order) and (smaller, larger) edges of the graph as of
+        vertex m whose bounding boxes meet the world rectangle `rect`.
+        """
+        min_x, min_y, max_x, max_y = rect
+        xs = np.frombuffer(graph.store.xs, dtype=np.float64)
+        ys = np.frombuffer(graph.store.ys, dtype=np.float64)
+        vx, vy = xs[1:m + 1], ys[1:m + 1]
+        inside = (vx >= min_x) & (vx <= max_x) & (vy >= min_y) & (vy <= max_y)
+        visible_ids = (np.flatnonzero(inside) + 1).tolist()
+
+        hi, lo = graph.adjacency.edge_prefix(m)
+        x1, x2, y1, y2 = xs[hi], xs[lo], ys[hi], ys[lo]
+        crossing = ((np.maximum(x1, x2) >= min_x) & (np.minimum(x1, x2) <= max_x)
+                    & (np.maximum(y1, y2) >= min_y) & (np.minimum(y1, y2) <= max_y))
+        visible_edges = list(zip(lo[crossing].tolist(), hi[crossing].tolist()))
+        return visible_ids, visible_edges
+
     def get_vertex_at_pos(self, graph, screen_pos, visible_limit):
-        for v_id, vertex in reversed(list(graph.vertices.items())):
+        # Only vertices in the grid cells under the cursor can be hit; the
+        # hit radius never exceeds the largest vertex radius in world units.
+        world_x, world_y = self._inverse_transform(screen_pos)
+        reach = 15 + math.log(len(graph.vertices) + 1, 10) * 5
+        hit_id = None
+        candidates = graph.spatial_index.vertices_near(world_x, world_y, reach)
+        screen = self.screen_positions(graph, candidates)
+        for v_id in candidates:
             if visible_limit and v_id > visible_limit:
                 continue
+            # The topmost (highest id) vertex wins
+            if hit_id is not None and v_id < hit_id:
+                continue
             
-            v_screen_pos = self._transform(vertex.pos)
+            v_screen_pos = screen[v_id]
             radius = int((15 + math.log(v_id + 1, 10) * 5) * self.zoom_level)
             
             distance = math.sqrt((v_screen_pos[0] - screen_pos[0])**2 + (v_screen_pos[1] - screen_pos[1])**2)
             if distance <= radius:
-                return vertex
-        return None
-
-    def _transform(self, pos):
-        """Applies pan and zoom to a world coordinate."""
-        x = pos[0] * self.zoom_level + self.pan_offset[0]
-        y = pos[1] * self.zoom_level + self.pan_offset[1]
-        return int(x), int(y)
-    
-    def _transform_with_offset(self, pos, offset_x):
-        """Applies pan and zoom to a world coordinate with additional offset."""
-        x = pos[0] * self.zoom_level + self.pan_offset[0] - offset_x
-        y = pos[1] * self.zoom_level + self.pan_offset[1]
-        return int(x), int(y)
-    
+                hit_id = v_id
+        return graph.vertices[hit_id] if hit_id is not None else None
+
+    def screen_positions(self, graph, ids, offset_x=0):
+        """
+        Dict of vertex id -> integer screen position covering at least `ids`.
+
+        Positions missing from the cache are transformed together in one
+        NumPy operation; the cache is kept until the graph, pan, zoom, offset
+        or any vertex position changes, so culling, edges, vertices and
+        hit-testing in the same view share one transform per vertex.
+        """
+        key = (graph.revision(), len(graph.store), self.zoom_level,
+               self.pan_offset[0], self.pan_offset[1], offset_x)
+        if key != self._screen_key:
+            self._screen = {}
+            self._screen_key = key
+        screen = self._screen
+        missing = set(ids).difference(screen)
+        if missing:
+            missing = np.fromiter(missing, dtype=np.intp, count=len(missing))
+            xs = np.frombuffer(graph.store.xs, dtype=np.float64)[missing]
+            ys = np.frombuffer(graph.store.ys, dtype=np.float64)[missing]
+            # Rounded down, so a view shifted by whole pixels (a scrolled
+            # layer, the next export tile) lands on exactly the same pixels;
+            # far off-screen points are clamped to pygame's coordinate range
+            sx = np.floor(np.clip(xs * self.zoom_level + (self.pan_offset[0] - offset_x), -2**30, 2**30)).astype(np.int64)
+            sy = np.floor(np.clip(ys * self.zoom_level + self.pan_offset[1], -2**30, 2**30)).astype(np.int64)
+            screen.update(zip(missing.tolist(), zip(sx.tolist(), sy.tolist())))
+        return screen
+
     def _inverse_transform(self, screen_pos):
         """Converts a screen coordinate back to a world coordinate."""
         x = (screen_pos[0] - self.pan_offset[0]) / self.zoom_level
         y = (screen_pos[1] - self.pan_offset[1]) / self.zoom_level
         return x, y
     
-    def _draw_smooth_curved_edge(self, surface, pos1, pos2, color, width):
-        """Draw a smooth curved edge between two points."""
-        dx = pos2[0] - pos1[0]
-        dy = pos2[1] - pos1[1]
-        length = math.sqrt(dx*dx + dy*dy)
-        
-        if length < 10:  # Too short for curves
-            pygame.draw.line(surface, color, pos1, pos2, width)
-            return
-        
-        # Create a gentle curve with much smaller curvature
-        mid_x = (pos1[0] + pos2[0]) / 2
-        mid_y = (pos1[1] + pos2[1]) / 2
-        
-        # Very subtle curve - only 5% of edge length
-        curve_factor = min(10, length * 0.05)
-        perp_x = -dy / length * curve_factor
-        perp_y = dx / length * curve_factor
-        
-        control_x = int(mid_x + perp_x)
-        control_y = int(mid_y + perp_y)
-        
-        # Draw smooth curve with fewer, cleaner segments
-        points = []
-        num_segments = max(4, min(12, int(length / 30)))
-        
-        for i in range(num_segments + 1):
-            t = i / num_segments
-            # Quadratic bezier curve
-            x = (1-t)**2 * pos1[0] + 2*(1-t)*t * control_x + t**2 * pos2[0]
-            y = (1-t)**2 * pos1[1] + 2*(1-t)*t * control_y + t**2 * pos2[1]
-            points.append((int(x), int(y)))
-        
-        # Draw smooth connected segments
-        try:
-            for i in range(len(points) - 1):
-                pygame.draw.line(surface, color, points[i], points[i+1], width)
-        except (ValueError, OverflowError):
-            # Fallback to straight line
-            pygame.draw.line(surface, color, pos1, pos2, width)
-    
-    def _is_vertex_visible(self, vertex_pos, screen_width, screen_height):
-        """Check if a vertex is visible on screen for performance optimization."""
-        screen_pos = self._transform_with_offset(vertex_pos, 0)
-        margin = 100  # Extra margin for partially visible vertices
-        return (-margin <= screen_pos[0] <= screen_width + margin and 
-                -margin <= screen_pos[1] <= screen_height + margin)
\ No newline at end of file
+    def _draw_curved_edges(self, surface, graph, edges, color, width, offset_x=0):
+        """Draw edges as gentle curves from their cached world-space tessellations."""
+        xs, ys, counts = self.curve_cache.polylines(edges, graph.store.xs, graph.store.ys)
+        # Every sample point of every curve is transformed in one batch
+        sx = np.floor(np.clip(xs * self.zoom_level + (self.pan_offset[0] - offset_x), -2**30, 2**30)).astype(np.int64)
+        sy = np.floor(np.clip(ys * self.zoom_level + self.pan_offset[1], -2**30, 2**30)).astype(np.int64)
+        points = list(zip(sx.tolist(), sy.tolist()))
+        start = 0
+        for count in counts:
+            pygame.draw.lines(surface, color, False, points[start:start + count], width)
+            start += count
+
+    def _visible_world_rect(self, region, offset_x=0, margin=100):
+        """World-space rectangle covered by a screen region, with a margin in pixels."""
+        min_x, min_y = self._inverse_transform((region.left + offset_x - margin, region.top - margin))
+        max_x, max_y = self._inverse_transform((region.right + offset_x + margin, region.bottom + margin))
+        return min_x, min_y, max_x, max_y
@@ -0,0 +1,109 @@
+# snapshot.py - Compact binary save/load of a graph
+#
+# A snapshot is a fixed header followed by the graph's flat arrays exactly as
+# they sit in memory, so loading is a memory map plus a copy per array, with
+# nothing to parse.  Everything is little-endian and every array starts on an
+# 8-byte boundary:
+#
+#   header      magic, format version, vertex / edge / periphery / custom
+#               color counts (see HEADER)
+#   xs, ys      float64[vertices + 1]   positions by id (slot 0 unused)
+#   colors      int8[vertices + 1]      color numbers by id
+#   edge_hi     int32[edges]            larger endpoint of each edge
+#   edge_lo     int32[edges]            smaller endpoint of each edge
+#   periphery   int32[periphery]        periphery in clockwise order
+#   custom      int32[custom, 4]        (id, r, g, b) of off-palette colors
+#
+# Only the data is stored.  Derived structures (neighbor arrays, the spatial
+# index, position aggregates) are rebuilt lazily by the graph on first use.
+import mmap
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'PTGSNAP\0'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sII4Q')
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _layout(vertices, edges, periphery, custom):
+    """(name, dtype, count, offset) of every array, and the total file size."""
+    arrays = []
+    offset = HEADER.size
+    for name, dtype, count in (('xs', '<f8', vertices + 1), ('ys', '<f8', vertices + 1),
+                               ('colors', 'i1', vertices + 1), ('edge_hi', '<i4', edges),
+                               ('edge_lo', '<i4', edges), ('periphery', '<i4', periphery),
+                               ('custom', '<i4', custom * 4)):
+        offset = _align(offset)
+        arrays.append((name, dtype, count, offset))
+        offset += np.dtype(dtype).itemsize * count
+    return arrays, offset
+
+
+def save(graph, path):
+    """
+    Write `graph` to `path`. The file is written next to `path` first and
+    renamed over it, so an interrupted save never leaves a truncated file.
+    """
+    store = graph.store
+    edge_hi, edge_lo = graph.adjacency.edge_arrays()
+    custom = [(v_id,) + tuple(rgb[:3]) for v_id, rgb in sorted(store.custom_colors.items())]
+    data = {
+        'xs': np.frombuffer(store.xs, dtype=np.float64),
+        'ys': np.frombuffer(store.ys, dtype=np.float64),
+        'colors': np.frombuffer(store.color_numbers, dtype=np.int8),
+        'edge_hi': np.frombuffer(edge_hi, dtype=np.intc),
+        'edge_lo': np.frombuffer(edge_lo, dtype=np.intc),
+        'periphery': np.fromiter(graph.periphery, dtype=np.int64, count=len(graph.periphery)),
+        'custom': np.array(custom, dtype=np.int64).reshape(-1),
+    }
+    arrays, size = _layout(len(store), len(edge_hi), len(data['periphery']), len(custom))
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(store), len(edge_hi),
+                            len(data['periphery']), len(custom)))
+        for name, dtype, count, offset in arrays:
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(np.ascontiguousarray(data[name], dtype=dtype).data)
+    os.replace(temp_path, path)
+    return size
+
+
+def load(path, graph):
+    """
+    Replace the contents of `graph` with the snapshot at `path`. Raises
+    ValueError if the file is not a snapshot or is truncated.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if len(mapped) < HEADER.size:
+            raise ValueError(f"{path} is not a graph snapshot")
+        magic, version, _, vertices, edges, periphery, custom = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a graph snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported snapshot version {version}")
+        arrays, size = _layout(vertices, edges, periphery, custom)
+        if len(mapped) < size:
+            raise ValueError(f"{path} is truncated ({len(mapped)} of {size} bytes)")
+
+        # Views straight into the mapping; the graph copies what it keeps,
+        # and they must all be gone before the mapping closes
+        views = {name: np.frombuffer(mapped, dtype=dtype, count=count, offset=offset)
+                 for name, dtype, count, offset in arrays}
+        custom_colors = {int(v_id): (int(r), int(g), int(b))
+                         for v_id, r, g, b in views['custom'].reshape(-1, 4).tolist()}
+        graph.load_arrays(np.asarray(views['xs'], dtype=np.float64),
+                          np.asarray(views['ys'], dtype=np.float64),
+                          np.asarray(views['edge_hi'], dtype=np.intc),
+                          np.asarray(views['edge_lo'], dtype=np.intc),
+                          views['periphery'].tolist(),
+                          views['colors'],
+                          custom_colors)
+        del views
+    return graph
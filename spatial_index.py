@@ -0,0 +1,320 @@
+# spatial_index.py
+import math
+import numpy as np
+
+# Edges whose bounding box covers more cells than this are kept in a separate
+# list and tested against each query rectangle instead of being bucketed.
+LONG_EDGE_CELLS = 16
+
+
+def edge_key(u, v):
+    """Pack an undirected edge into one int (larger id in the high bits)."""
+    if u < v:
+        u, v = v, u
+    return (u << 32) | v
+
+
+def edge_from_key(key):
+    """Unpack an edge key into a sorted (smaller id, larger id) tuple."""
+    return key & 0xFFFFFFFF, key >> 32
+
+
+def _segment_hits_rect(x1, y1, x2, y2, min_x, min_y, max_x, max_y):
+    """Liang-Barsky test: does the segment intersect the rectangle?"""
+    t0, t1 = 0.0, 1.0
+    dx, dy = x2 - x1, y2 - y1
+    for p, q in ((-dx, x1 - min_x), (dx, max_x - x1), (-dy, y1 - min_y), (dy, max_y - y1)):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                if t > t1:
+                    return False
+                t0 = max(t0, t)
+            else:
+                if t < t0:
+                    return False
+                t1 = min(t1, t)
+    return True
+
+
+class SpatialIndex:
+    """
+    Uniform hash grid over world space for the graph's vertices and edges.
+
+    Cells are square, keyed by their (column, row) and only stored when
+    occupied, so layouts of any extent cost memory proportional to the
+    graph.  Vertices sit in the cell containing them; edges are bucketed in
+    every cell their bounding box covers (long edges go to a separate list),
+    so an edge crossing a region is found even if both endpoints are outside.
+
+    The index follows the graph lazily: appended vertices and edges and
+    single moves (from the store's move journal) are applied incrementally
+    on the next query, and a bulk position rewrite (a new store version,
+    e.g. after redraw_graph) triggers a full rebuild that also re-picks the
+    cell size from the current edge lengths.
+    """
+    def __init__(self, store, adjacency):
+        self.store = store
+        self.adjacency = adjacency
+        self.cell_size = 100.0
+        self._cells = {}
+        self._edge_cells = {}
+        self._long_edges = set()
+        self._version = None
+        self._vertex_count = 0
+        self._edge_count = 0
+
+    def _cell_of(self, x, y):
+        size = self.cell_size
+        return math.floor(x / size), math.floor(y / size)
+
+    def _add(self, v_id, x, y):
+        key = self._cell_of(x, y)
+        cell = self._cells.get(key)
+        if cell is None:
+            self._cells[key] = [v_id]
+        else:
+            cell.append(v_id)
+
+    def _remove(self, v_id, x, y):
+        key = self._cell_of(x, y)
+        cell = self._cells[key]
+        cell.remove(v_id)
+        if not cell:
+            del self._cells[key]
+
+    def _edge_span(self, x1, y1, x2, y2):
+        col0, row0 = self._cell_of(min(x1, x2), min(y1, y2))
+        col1, row1 = self._cell_of(max(x1, x2), max(y1, y2))
+        return col0, row0, col1, row1
+
+    def _add_edge(self, key, x1, y1, x2, y2):
+        col0, row0, col1, row1 = self._edge_span(x1, y1, x2, y2)
+        if (col1 - col0 + 1) * (row1 - row0 + 1) > LONG_EDGE_CELLS:
+            self._long_edges.add(key)
+            return
+        cells = self._edge_cells
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                cell = cells.get((col, row))
+                if cell is None:
+                    cells[(col, row)] = [key]
+                else:
+                    cell.append(key)
+
+    def _remove_edge(self, key, x1, y1, x2, y2):
+        col0, row0, col1, row1 = self._edge_span(x1, y1, x2, y2)
+        if (col1 - col0 + 1) * (row1 - row0 + 1) > LONG_EDGE_CELLS:
+            self._long_edges.discard(key)
+            return
+        cells = self._edge_cells
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                cell = cells.get((col, row))
+                if cell is not None and key in cell:
+                    cell.remove(key)
+                    if not cell:
+                        del cells[(col, row)]
+
+    def rebuild(self):
+        """Re-bucket every vertex, choosing a cell size for the current layout."""
+        store = self.store
+        xs = np.frombuffer(store.xs, dtype=np.float64)[1:]
+        ys = np.frombuffer(store.ys, dtype=np.float64)[1:]
+        radii = np.frombuffer(store.radii, dtype=np.float32)
+
+        # About one edge length per cell, but never smaller than a vertex
+        edge_hi, edge_lo = self.adjacency.edge_arrays()
+        cell_size = 100.0
+        if len(edge_hi):
+            hi = np.frombuffer(edge_hi, dtype=np.intc)
+            lo = np.frombuffer(edge_lo, dtype=np.intc)
+            all_xs = np.frombuffer(store.xs, dtype=np.float64)
+            all_ys = np.frombuffer(store.ys, dtype=np.float64)
+            median = float(np.median(np.hypot(all_xs[hi] - all_xs[lo], all_ys[hi] - all_ys[lo])))
+            if math.isfinite(median) and median > 0:
+                cell_size = median
+        self.cell_size = max(cell_size, 2.0 * float(radii.max()))
+
+        self._cells = {}
+        if len(xs):
+            # Group ids by cell with one sort instead of a dict per vertex
+            col = np.floor(xs / self.cell_size)
+            row = np.floor(ys / self.cell_size)
+            order = np.lexsort((row, col))
+            col, row = col[order], row[order]
+            starts = np.flatnonzero(np.r_[True, (col[1:] != col[:-1]) | (row[1:] != row[:-1])])
+            ids = (order + 1).tolist()
+            bounds = starts.tolist() + [len(ids)]
+            for c, r, start, stop in zip(col[starts].tolist(), row[starts].tolist(), bounds, bounds[1:]):
+                self._cells[(int(c), int(r))] = ids[start:stop]
+
+        self._rebuild_edges(np.frombuffer(store.xs, dtype=np.float64),
+                            np.frombuffer(store.ys, dtype=np.float64))
+
+        self._version = store.version
+        store.drain_moves()
+        self._vertex_count = len(store)
+        self._edge_count = len(self.adjacency)
+
+    def _rebuild_edges(self, xs, ys):
+        """Bucket every edge by bounding box, expanding cell ranges with NumPy."""
+        self._edge_cells = {}
+        self._long_edges = set()
+        edge_hi, edge_lo = self.adjacency.edge_arrays()
+        if not len(edge_hi):
+            return
+        hi = np.frombuffer(edge_hi, dtype=np.intc).astype(np.int64)
+        lo = np.frombuffer(edge_lo, dtype=np.intc).astype(np.int64)
+        keys = (hi << 32) | lo
+        size = self.cell_size
+        col0 = np.floor(np.minimum(xs[hi], xs[lo]) / size)
+        col1 = np.floor(np.maximum(xs[hi], xs[lo]) / size)
+        row0 = np.floor(np.minimum(ys[hi], ys[lo]) / size)
+        row1 = np.floor(np.maximum(ys[hi], ys[lo]) / size)
+        rows = row1 - row0 + 1
+        spans = (col1 - col0 + 1) * rows
+
+        long = spans > LONG_EDGE_CELLS
+        self._long_edges = set(keys[long].tolist())
+        short = ~long
+        keys, col0, row0, rows = keys[short], col0[short], row0[short], rows[short]
+        counts = spans[short].astype(np.int64)
+
+        # One (cell, edge) entry per covered cell
+        owner = np.repeat(np.arange(len(keys)), counts)
+        step = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+        col = col0[owner] + step // rows[owner]
+        row = row0[owner] + step % rows[owner]
+        order = np.lexsort((row, col))
+        col, row, entries = col[order], row[order], keys[owner[order]].tolist()
+        starts = np.flatnonzero(np.r_[True, (col[1:] != col[:-1]) | (row[1:] != row[:-1])])
+        bounds = starts.tolist() + [len(entries)]
+        for c, r, start, stop in zip(col[starts].tolist(), row[starts].tolist(), bounds, bounds[1:]):
+            self._edge_cells[(int(c), int(r))] = entries[start:stop]
+
+    def sync(self):
+        """Bring the index up to date with the vertex store."""
+        store = self.store
+        if self._version != store.version:
+            self.rebuild()
+            return
+
+        moves = store.drain_moves()
+        if moves:
+            # Only the first recorded old position of each vertex is where
+            # the index still has it
+            first_old = {}
+            for v_id, old_x, old_y in moves:
+                if v_id <= self._vertex_count and v_id not in first_old:
+                    first_old[v_id] = (old_x, old_y)
+            xs, ys = store.xs, store.ys
+            for v_id, (old_x, old_y) in first_old.items():
+                if self._cell_of(old_x, old_y) != self._cell_of(xs[v_id], ys[v_id]):
+                    self._remove(v_id, old_x, old_y)
+                    self._add(v_id, xs[v_id], ys[v_id])
+
+            # Re-bucket every indexed edge touching a moved vertex, once
+            moved_edges = set()
+            for v_id in first_old:
+                for n_id in self.adjacency.neighbors(v_id):
+                    if n_id <= self._vertex_count:
+                        moved_edges.add(edge_key(v_id, n_id))
+            for key in moved_edges:
+                lo_id, hi_id = edge_from_key(key)
+                old_lo = first_old.get(lo_id, (xs[lo_id], ys[lo_id]))
+                old_hi = first_old.get(hi_id, (xs[hi_id], ys[hi_id]))
+                self._remove_edge(key, old_lo[0], old_lo[1], old_hi[0], old_hi[1])
+                self._add_edge(key, xs[lo_id], ys[lo_id], xs[hi_id], ys[hi_id])
+
+        count = len(store)
+        if count > self._vertex_count:
+            xs, ys = store.xs, store.ys
+            for v_id in range(self._vertex_count + 1, count + 1):
+                self._add(v_id, xs[v_id], ys[v_id])
+            self._vertex_count = count
+
+        edge_count = len(self.adjacency)
+        if edge_count > self._edge_count:
+            xs, ys = store.xs, store.ys
+            edge_hi, edge_lo = self.adjacency.edge_arrays()
+            for i in range(self._edge_count, edge_count):
+                hi_id, lo_id = edge_hi[i], edge_lo[i]
+                self._add_edge((hi_id << 32) | lo_id, xs[lo_id], ys[lo_id], xs[hi_id], ys[hi_id])
+            self._edge_count = edge_count
+        elif edge_count < self._edge_count:
+            self.rebuild()
+
+    def discard_last_vertex(self, v_id):
+        """
+        Take the most recently added vertex and its edges (the last ones
+        in the edge arrays) out of the index, just before they are removed
+        from the graph.
+        """
+        if self._version != self.store.version:
+            # Never built, or a rebuild is due anyway
+            return
+        self.sync()
+        if v_id > self._vertex_count:
+            return
+        xs, ys = self.store.xs, self.store.ys
+        for n_id in self.adjacency.neighbors(v_id):
+            self._remove_edge(edge_key(v_id, n_id), xs[n_id], ys[n_id], xs[v_id], ys[v_id])
+            self._edge_count -= 1
+        self._remove(v_id, xs[v_id], ys[v_id])
+        self._vertex_count -= 1
+
+    def _cell_range(self, min_x, min_y, max_x, max_y, cells=None):
+        """Occupied cells overlapping a world-space rectangle, as id lists."""
+        col0, row0 = self._cell_of(min_x, min_y)
+        col1, row1 = self._cell_of(max_x, max_y)
+        if cells is None:
+            cells = self._cells
+        if (col1 - col0 + 1) * (row1 - row0 + 1) > len(cells):
+            # Wider than the occupied area: filter the occupied cells instead
+            return [ids for (col, row), ids in cells.items()
+                    if col0 <= col <= col1 and row0 <= row <= row1]
+        found = []
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                ids = cells.get((col, row))
+                if ids:
+                    found.append(ids)
+        return found
+
+    def vertices_near(self, x, y, radius):
+        """Ids of the vertices in the cells within `radius` of (x, y) (a superset)."""
+        self.sync()
+        found = []
+        for ids in self._cell_range(x - radius, y - radius, x + radius, y + radius):
+            found.extend(ids)
+        return found
+
+    def vertices_in_rect(self, min_x, min_y, max_x, max_y):
+        """Ids of the vertices in the cells overlapping the rectangle (a superset)."""
+        self.sync()
+        found = []
+        for ids in self._cell_range(min_x, min_y, max_x, max_y):
+            found.extend(ids)
+        return found
+
+    def edges_in_rect(self, min_x, min_y, max_x, max_y):
+        """
+        Edges (as sorted id tuples) whose bounding box shares a cell with the
+        rectangle, plus long edges whose segment actually crosses it.
+        """
+        self.sync()
+        keys = set()
+        for cell in self._cell_range(min_x, min_y, max_x, max_y, self._edge_cells):
+            keys.update(cell)
+        edges = [edge_from_key(key) for key in keys]
+        xs, ys = self.store.xs, self.store.ys
+        for key in self._long_edges:
+            lo_id, hi_id = edge_from_key(key)
+            if _segment_hits_rect(xs[lo_id], ys[lo_id], xs[hi_id], ys[hi_id],
+                                  min_x, min_y, max_x, max_y):
+                edges.append((lo_id, hi_id))
+        return edges
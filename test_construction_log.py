@@ -0,0 +1,48 @@
+# test_construction_log.py
+import random
+
+from graph import Graph
+
+
+def _state(graph):
+    hi, lo = graph.adjacency.edge_arrays()
+    return (list(graph.store.xs), list(graph.store.ys), list(hi), list(lo), list(graph.periphery),
+            bytes(graph.log.data), len(graph.log))
+
+
+def _built(count, seed):
+    graph = Graph()
+    graph.verbose = False
+    graph.start_basic_graph()
+    rng = random.Random(seed)
+    for _ in range(count):
+        graph.add_random_vertex(rng=rng)
+    return graph
+
+
+def test_replay_undo_replay():
+    original = _built(50, 1)
+    log = original.log.copy()
+
+    replayed = log.replay(Graph())
+    assert _state(replayed) == _state(original)
+    # The replayed steps cannot be undone: they have no log marks
+    assert replayed.undo() is None
+
+    replayed.verbose = False
+    replayed.add_random_vertex()
+    assert replayed.undo() == 'insert'
+    assert _state(replayed) == _state(original)
+
+    # The log still describes exactly what is drawn
+    again = replayed.log.copy().replay(Graph())
+    assert _state(again) == _state(replayed)
+
+
+def test_replay_leaves_stdout_alone(capsys):
+    log = _built(20, 2).log.copy()
+    graph = Graph()
+    # Output from outside the graph (here the progress callback) still shows
+    log.replay(graph, progress=lambda done, total: print(f"{done}/{total}"))
+    assert capsys.readouterr().out == "20/20\n"
+    assert graph.verbose
@@ -0,0 +1,32 @@
+# test_incremental_layout.py
+import math
+import random
+
+from graph import Graph
+
+
+def test_global_passes_stay_near_linear():
+    graph = Graph()
+    graph.verbose = False
+    graph.start_basic_graph()
+    graph.toggle_incremental_layout()
+    assert graph.layout_mode == "force"
+
+    passes = []
+    redraw_layout = graph._redraw_layout
+
+    def counted(mode, progress=None):
+        passes.append((len(graph.vertices), mode))
+        redraw_layout(mode, progress)
+
+    graph._redraw_layout = counted
+    count = 3000
+    graph.add_vertices_bulk(count=count, rng=random.Random(1))
+
+    # Checks run once per `layout_check_growth` factor of growth, and a pass
+    # never falls back to the O(V^2) force layout
+    assert passes
+    assert len(passes) <= math.log(count) / math.log(graph.layout_check_growth) + 1
+    assert {mode for _, mode in passes} == {graph.global_pass_mode}
+    sizes = [size for size, _ in passes]
+    assert all(later >= earlier * graph.layout_check_growth for earlier, later in zip(sizes, sizes[1:]))
@@ -0,0 +1,31 @@
+# test_layout.py
+import numpy as np
+
+import layout
+
+
+def test_tutte_with_stalled_aggregation():
+    # Interior vertices that only touch the fixed ring cannot be grouped, so
+    # the hierarchy stops at full size; it must not be inverted densely
+    ring = 12
+    count = 6000
+    size = 1 + ring + count
+    angles = 2 * np.pi * np.arange(ring) / ring
+    xs = np.zeros(size)
+    ys = np.zeros(size)
+    xs[1:ring + 1] = 100 * np.cos(angles)
+    ys[1:ring + 1] = 100 * np.sin(angles)
+    interior = np.arange(ring + 1, size)
+    first = (interior - ring - 1) % ring + 1
+    edge_hi = np.repeat(interior, 3)
+    edge_lo = np.column_stack((first, first % ring + 1, (first + 1) % ring + 1)).ravel()
+
+    no_edges = np.zeros(0, dtype=np.int64)
+    multigrid = layout.Multigrid(np.full(count, 3.0), no_edges, no_edges)
+    assert len(multigrid.levels) == 1 and 'inverse' not in multigrid.levels[0]
+
+    iterations, converged = layout.tutte_embedding(xs, ys, interior, edge_hi, edge_lo)
+    assert converged and iterations <= 2
+    corners = edge_lo.reshape(-1, 3)
+    assert np.allclose(xs[interior], xs[corners].mean(axis=1))
+    assert np.allclose(ys[interior], ys[corners].mean(axis=1))
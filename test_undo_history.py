@@ -0,0 +1,43 @@
+# test_undo_history.py
+import random
+
+from graph import Graph
+
+
+def _state(graph):
+    hi, lo = graph.adjacency.edge_arrays()
+    return (list(graph.store.xs), list(graph.store.ys), list(hi), list(lo), list(graph.periphery),
+            graph.store.aggregates(), bytes(graph.log.data), len(graph.log))
+
+
+def test_generated_graph_is_one_undo_step():
+    graph = Graph()
+    graph.verbose = False
+    graph.layout_mode = "tutte"
+    # Periodic redraws inside the bulk insertion are part of the same step
+    graph.generate_large_graph(400, rng=random.Random(2))
+    generated = _state(graph)
+    assert graph.history.undo_count() == 1
+
+    assert graph.undo() == 'bulk'
+    assert len(graph.vertices) == 3
+    assert graph.undo() is None
+    assert graph.redo() == 'bulk'
+    assert _state(graph) == generated
+
+
+def test_byte_budget_drops_oldest_entries():
+    graph = Graph()
+    graph.verbose = False
+    graph.start_basic_graph()
+    graph.add_vertices_bulk(count=2000, rng=random.Random(3))
+    # Each redraw keeps the previous positions: about 32 kB here
+    graph.history.byte_limit = 100000
+    for _ in range(10):
+        graph.redraw_graph("tutte")
+    assert graph.history.nbytes <= graph.history.byte_limit
+    assert 1 <= graph.history.undo_count() < 10
+    while graph.undo() == 'redraw':
+        pass
+    # The bulk insertion was evicted, so the graph stays built
+    assert len(graph.vertices) == 2003
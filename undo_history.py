@@ -0,0 +1,108 @@
+# undo_history.py
+from array import array
+from collections import deque
+
+import numpy as np
+
+
+def entry_bytes(value):
+    """Rough memory held by an undo entry (position snapshots dominate)."""
+    if isinstance(value, dict):
+        return 64 + sum(map(entry_bytes, value.values()))
+    if isinstance(value, (list, tuple)):
+        return 56 + 8 * len(value) + sum(map(entry_bytes, value))
+    if isinstance(value, array):
+        return 64 + len(value) * value.itemsize
+    if isinstance(value, np.ndarray):
+        return 112 + value.nbytes
+    return 32
+
+
+class UndoHistory:
+    """
+    Undo and redo stacks for graph mutations.
+
+    An entry never copies the graph: it holds the inverse delta of one
+    operation (see Graph.undo), so its size and the cost of undoing it
+    follow the operation rather than the graph.  Recording a new entry
+    clears the redo stack, except while `redoing` (a redo re-runs the
+    operation, which records its entry again).  Between `begin_group` and
+    the matching `end_group`, entries are collected into one compound entry
+    (`group`) that is undone as a whole.  The oldest entries are dropped
+    beyond `limit` entries or `byte_limit` bytes (see `entry_bytes`); the
+    newest entry is always kept.
+    """
+    def __init__(self, limit=10000, byte_limit=64 << 20):
+        self.limit = limit
+        self.byte_limit = byte_limit
+        self._undo = deque()
+        self._sizes = deque()
+        self.nbytes = 0
+        self._redo = []
+        self.redoing = False
+        self.group = None
+        self._group_depth = 0
+
+    def record(self, entry):
+        if not self.redoing:
+            self._redo.clear()
+        if self.group is not None:
+            self.group['entries'].append(entry)
+            return
+        size = entry_bytes(entry)
+        self._undo.append(entry)
+        self._sizes.append(size)
+        self.nbytes += size
+        while len(self._undo) > 1 and (len(self._undo) > self.limit or self.nbytes > self.byte_limit):
+            self._undo.popleft()
+            self.nbytes -= self._sizes.popleft()
+
+    def begin_group(self, kind):
+        """Collect entries into one `kind` entry until the matching end_group."""
+        if self.group is None:
+            self.group = {'kind': kind, 'entries': []}
+        self._group_depth += 1
+
+    def end_group(self):
+        """Close a group; the outermost one is recorded (if anything was)."""
+        self._group_depth -= 1
+        if self._group_depth == 0:
+            group, self.group = self.group, None
+            if group['entries']:
+                self.record(group)
+
+    def pop_undo(self):
+        """Most recent entry, or None."""
+        if not self._undo:
+            return None
+        self.nbytes -= self._sizes.pop()
+        return self._undo.pop()
+
+    def push_redo(self, entry):
+        """Keep an undone operation (as `entry`) for redo."""
+        self._redo.append(entry)
+
+    def pop_redo(self):
+        """Most recently undone entry, or None."""
+        return self._redo.pop() if self._redo else None
+
+    def undo_count(self):
+        return len(self._undo)
+
+    def redo_count(self):
+        return len(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+        self._redo.clear()
+
+    def copy(self):
+        # Entries are never modified once recorded, so they can be shared
+        other = UndoHistory(self.limit, self.byte_limit)
+        other._undo.extend(self._undo)
+        other._sizes.extend(self._sizes)
+        other.nbytes = self.nbytes
+        other._redo = list(self._redo)
+        return other
@@ -1,54 +1,323 @@
 # vertex.py
+import math
+from array import array
+from collections.abc import Mapping
+from numbers import Integral
+
+import numpy as np
+
+# Default color palette shared by every vertex (color numbers 1-4)
+COLOR_PALETTE = {
+    1: (255, 120, 120),  # Light Red
+    2: (120, 255, 120),  # Light Green
+    3: (120, 120, 255),  # Light Blue
+    4: (255, 255, 120)   # Light Yellow
+}
+
+BASE_RADIUS = 15
+
+
+class VertexStore:
+    """
+    Struct-of-arrays storage for all vertex data.
+
+    Vertex ids are dense and monotonic (handed out by `Graph.next_vertex_id`),
+    so each attribute lives in one contiguous array indexed directly by id.
+    Slot 0 is an unused placeholder so that index == vertex id everywhere.
+    The store also keeps running position aggregates (sum and min/max
+    extents) so the graph center and bounding box are O(1).
+
+    Derived structures (e.g. the spatial index) follow position changes
+    through `version`, bumped whenever positions are reset or rewritten in
+    bulk, and a journal of single-vertex moves drained with `drain_moves()`.
+    `revision` is bumped by every change at all (including colors), for
+    caches that only need to know whether anything changed.
+    """
+    def __init__(self):
+        self.version = 0
+        self.revision = 0
+        self.clear()
+
+    def clear(self):
+        self.version += 1
+        self.revision += 1
+        self._moves = []
+        self.xs = array('d', [0.0])
+        self.ys = array('d', [0.0])
+        self.color_numbers = array('b', [0])
+        self.radii = array('f', [0.0])
+        # Colors that are not in the palette, keyed by vertex id (rare)
+        self.custom_colors = {}
+        self._reset_aggregates()
+
+    def __len__(self):
+        return len(self.xs) - 1
+
+    def __contains__(self, v_id):
+        return (type(v_id) is int or isinstance(v_id, Integral)) and 0 < v_id < len(self.xs)
+
+    def ids(self):
+        return range(1, len(self.xs))
+
+    def pop(self):
+        """Remove the most recently added vertex (the inverse of `add`); returns its id."""
+        v_id = len(self.xs) - 1
+        if v_id < 1:
+            raise ValueError("No vertex to remove")
+        self.xs.pop()
+        self.ys.pop()
+        self.color_numbers.pop()
+        self.radii.pop()
+        self.custom_colors.pop(v_id, None)
+        self.revision += 1
+        # Callers undoing an insertion put back the aggregates from before it
+        self._aggregates_dirty = True
+        return v_id
+
+    def load(self, xs, ys, color_numbers=None, custom_colors=None):
+        """
+        Replace every vertex at once from buffers laid out by id (slot 0
+        included, as in `replace_positions`): float64 positions and,
+        optionally, int8 color numbers (default 1) and custom colors.
+        """
+        self.clear()
+        self.xs = array('d')
+        self.ys = array('d')
+        self.xs.frombytes(memoryview(xs).cast('B'))
+        self.ys.frombytes(memoryview(ys).cast('B'))
+        if len(self.xs) != len(self.ys) or not self.xs:
+            raise ValueError("Position buffers must have the same length and include slot 0")
+        count = len(self.xs)
+        if color_numbers is None:
+            self.color_numbers = array('b', [0] + [1] * (count - 1))
+        else:
+            self.color_numbers = array('b')
+            self.color_numbers.frombytes(memoryview(color_numbers).cast('B'))
+            if len(self.color_numbers) != count:
+                raise ValueError("Color numbers must cover every vertex slot")
+        self.radii = array('f', [0.0])
+        self.radii.frombytes((BASE_RADIUS + np.log10(np.arange(2, count + 1)) * 5).astype(np.float32).tobytes())
+        if custom_colors:
+            self.custom_colors = dict(custom_colors)
+        self.positions_rewritten()
+
+    def add(self, v_id, x, y, color_number=1):
+        """Append a vertex; ids must be added in order without gaps."""
+        if v_id != len(self.xs):
+            raise ValueError(f"Vertex ids must be dense: expected {len(self.xs)}, got {v_id}")
+        self.xs.append(x)
+        self.ys.append(y)
+        self.color_numbers.append(max(1, min(4, color_number)))
+        self.revision += 1
+        # Radius increases logarithmically with vertex ID
+        self.radii.append(BASE_RADIUS + math.log10(v_id + 1) * 5)
+        if not self._aggregates_dirty:
+            self._sum_x += x
+            self._sum_y += y
+            if not self._extents_stale:
+                self._expand_extents(x, y)
+
+    # --- Positions and aggregates ---
+
+    def _reset_aggregates(self):
+        # Running sum of positions and min/max extents. A dirty flag defers a
+        # full rescan until the next query after positions have been
+        # rewritten in bulk; single moves only ever invalidate the extents,
+        # so the centroid stays O(1) under local edits.
+        self._sum_x = 0.0
+        self._sum_y = 0.0
+        self._min_x = self._min_y = math.inf
+        self._max_x = self._max_y = -math.inf
+        self._aggregates_dirty = False
+        self._extents_stale = False
+
+    def _expand_extents(self, x, y):
+        if x < self._min_x: self._min_x = x
+        if x > self._max_x: self._max_x = x
+        if y < self._min_y: self._min_y = y
+        if y > self._max_y: self._max_y = y
+
+    def _recompute_aggregates(self):
+        """Rescan every position (only needed after bulk rewrites)."""
+        self._reset_aggregates()
+        if len(self.xs) > 1:
+            self._sum_x = math.fsum(self.xs[1:])
+            self._sum_y = math.fsum(self.ys[1:])
+            self._recompute_extents()
+
+    def _recompute_extents(self):
+        xs = self.xs[1:]
+        ys = self.ys[1:]
+        self._min_x, self._max_x = min(xs), max(xs)
+        self._min_y, self._max_y = min(ys), max(ys)
+        self._extents_stale = False
+
+    def replace_positions(self, xs, ys):
+        """
+        Overwrite every coordinate at once from float64 buffers (anything
+        exposing the buffer protocol, e.g. NumPy arrays) laid out by id.
+        """
+        new_xs = array('d')
+        new_ys = array('d')
+        new_xs.frombytes(memoryview(xs).cast('B'))
+        new_ys.frombytes(memoryview(ys).cast('B'))
+        if len(new_xs) != len(self.xs) or len(new_ys) != len(self.ys):
+            raise ValueError("Position buffers must cover every vertex slot")
+        self.xs, self.ys = new_xs, new_ys
+        self.positions_rewritten()
+
+    def positions_rewritten(self):
+        """Mark aggregates and derived structures stale after a bulk rewrite."""
+        self._aggregates_dirty = True
+        self._moves = []
+        self.version += 1
+        self.revision += 1
+
+    def aggregates(self):
+        """Snapshot of the running aggregates, for `restore_aggregates`."""
+        return (self._sum_x, self._sum_y, self._min_x, self._min_y, self._max_x, self._max_y,
+                self._aggregates_dirty, self._extents_stale)
+
+    def restore_aggregates(self, state):
+        """
+        Put back aggregates saved by `aggregates()` while the positions were
+        as they are now again (e.g. after undoing everything since).
+        """
+        (self._sum_x, self._sum_y, self._min_x, self._min_y, self._max_x, self._max_y,
+         self._aggregates_dirty, self._extents_stale) = state
+
+    def drain_moves(self):
+        """Return and forget the (id, old x, old y) moves since the last drain."""
+        moves = self._moves
+        self._moves = []
+        return moves
+
+    def get_pos(self, v_id):
+        return self.xs[v_id], self.ys[v_id]
+
+    def set_pos(self, v_id, x, y):
+        """Move a single vertex, keeping the aggregates up to date."""
+        old_x, old_y = self.xs[v_id], self.ys[v_id]
+        self.xs[v_id] = x
+        self.ys[v_id] = y
+        self.revision += 1
+        self._moves.append((v_id, old_x, old_y))
+        # Past a quarter of the vertices, replaying the journal costs more
+        # than a rebuild: drop it and bump the version instead.
+        if len(self._moves) > 1024 + len(self.xs) // 4:
+            self._moves = []
+            self.version += 1
+        if self._aggregates_dirty:
+            return
+        self._sum_x += x - old_x
+        self._sum_y += y - old_y
+        if self._extents_stale:
+            return
+        # If the vertex was defining an extent and moved inward, the new
+        # extent is unknown without a rescan; defer it to the next query.
+        if ((old_x == self._min_x and x > old_x) or (old_x == self._max_x and x < old_x) or
+                (old_y == self._min_y and y > old_y) or (old_y == self._max_y and y < old_y)):
+            self._extents_stale = True
+        else:
+            self._expand_extents(x, y)
+
+    def center(self):
+        """Centroid of all positions."""
+        if self._aggregates_dirty:
+            self._recompute_aggregates()
+        count = len(self)
+        return self._sum_x / count, self._sum_y / count
+
+    def extents(self):
+        """(min_x, min_y, max_x, max_y) of all positions."""
+        if self._aggregates_dirty:
+            self._recompute_aggregates()
+        elif self._extents_stale and len(self) > 0:
+            self._recompute_extents()
+        return self._min_x, self._min_y, self._max_x, self._max_y
+
+    # --- Colors ---
+
+    def get_color(self, v_id):
+        custom = self.custom_colors.get(v_id)
+        if custom is not None:
+            return custom
+        return COLOR_PALETTE[self.color_numbers[v_id]]
+
 
 class Vertex:
-    """A vertex in the planar triangulated graph."""
-    def __init__(self, id, pos_x, pos_y, color_number=1):
-        # Every vertex has an associated location (X, Y) in the plane
+    """A vertex in the planar triangulated graph (a view into a VertexStore)."""
+    __slots__ = ('_store', 'id')
+
+    # Every vertex shares the module-level palette
+    color_palette = COLOR_PALETTE
+    base_radius = BASE_RADIUS
+
+    def __init__(self, store, id):
+        self._store = store
         self.id = id
-        self.pos = (pos_x, pos_y)
-        
-        # Color system: vertices are represented by circles with configurable colors
-        # Default color palette (can be modified by the graph)
-        self.color_palette = {
-            1: (255, 120, 120),  # Light Red
-            2: (120, 255, 120),  # Light Green  
-            3: (120, 120, 255),  # Light Blue
-            4: (255, 255, 120)   # Light Yellow
-        }
-        
-        # Set initial color based on color number (1-4)
-        self.color_number = max(1, min(4, color_number))
-        self.color = self.color_palette[self.color_number]
-        
-        # Variable radius based on vertex ID for better visibility of large numbers
-        self.base_radius = 15
-        self.radius = self.calculate_radius()
-    
+
+    def __eq__(self, other):
+        return isinstance(other, Vertex) and self._store is other._store and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"Vertex({self.id}, pos={self.pos})"
+
+    # Every vertex has an associated location (X, Y) in the plane
+    @property
+    def pos(self):
+        return self._store.xs[self.id], self._store.ys[self.id]
+
+    @pos.setter
+    def pos(self, value):
+        self._store.set_pos(self.id, value[0], value[1])
+
+    @property
+    def color_number(self):
+        return self._store.color_numbers[self.id]
+
+    @property
+    def color(self):
+        return self._store.get_color(self.id)
+
+    @color.setter
+    def color(self, rgb_color):
+        self._store.custom_colors[self.id] = rgb_color
+        self._store.revision += 1
+
+    @property
+    def radius(self):
+        return self._store.radii[self.id]
+
     def calculate_radius(self):
         """Calculate appropriate radius based on vertex ID."""
-        import math
         # Increase radius logarithmically with vertex ID
-        return self.base_radius + math.log(self.id + 1, 10) * 5
-    
+        return self.base_radius + math.log10(self.id + 1) * 5
+
     def set_color(self, color_number):
         """Set vertex color using color number (1-4)."""
         if 1 <= color_number <= 4:
-            self.color_number = color_number
-            self.color = self.color_palette[color_number]
+            self._store.color_numbers[self.id] = color_number
+            self._store.custom_colors.pop(self.id, None)
+            self._store.revision += 1
             return True
         return False
-    
+
     def set_custom_color(self, rgb_color):
         """Set a custom RGB color for the vertex."""
         if isinstance(rgb_color, tuple) and len(rgb_color) == 3:
-            self.color = rgb_color
             # Try to find matching color number, or default to 1
             for num, palette_color in self.color_palette.items():
                 if palette_color == rgb_color:
-                    self.color_number = num
+                    self.set_color(num)
                     return
-            self.color_number = 1
-    
+            self._store.color_numbers[self.id] = 1
+            self._store.custom_colors[self.id] = rgb_color
+            self._store.revision += 1
+
     def get_display_info(self):
         """Get information for display purposes."""
         return {
@@ -57,4 +326,29 @@ class Vertex:
             'color': self.color,
             'color_number': self.color_number,
             'radius': self.radius
-        }
\ No newline at end of file
+        }
+
+
+class VertexMapping(Mapping):
+    """Read-only id -> Vertex mapping over a VertexStore (views made on demand)."""
+    __slots__ = ('_store',)
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, v_id):
+        if v_id not in self._store:
+            raise KeyError(v_id)
+        return Vertex(self._store, v_id)
+
+    def __contains__(self, v_id):
+        return v_id in self._store
+
+    def __iter__(self):
+        return iter(self._store.ids())
+
+    def __len__(self):
+        return len(self._store)
+
+    def __repr__(self):
+        return f"VertexMapping({len(self)} vertices)"